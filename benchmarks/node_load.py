@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Node and Pump under load, against an emulated stick: how many broadcasts reach the callback, and how long commands
+take to be answered while the stick is flooding the node.
+
+    python3 benchmarks/node_load.py --devices 60 --load 10
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from libAnt.constants import MESSAGE_CHANNEL_STATUS
+from libAnt.drivers.emulator import EmulatedDriver
+from libAnt.message import RequestMessage
+from libAnt.node import Node
+
+
+def run(devices: int, load: float, duration: float, commands: int) -> dict:
+    """
+    :param load: Multiple of the real world rate of 4 broadcasts per second per device
+    """
+    rate = 4.0 * devices * load
+    driver = EmulatedDriver(devices, rate)
+    received = [0]
+    failures = []
+
+    def onSuccess(msg):
+        received[0] += 1
+
+    node = Node(driver, 'load')
+    node.enableRxScanMode()
+    node.start(onSuccess, failures.append)
+    try:
+        node.getCapabilities().result(5)  # Wait for the initialization to finish
+        start = time.perf_counter()
+        first = received[0]
+        latencies = []
+        interval = duration / commands
+        for i in range(commands):
+            sent = time.perf_counter()
+            node.write(RequestMessage(0, MESSAGE_CHANNEL_STATUS)).result(5)
+            latencies.append(time.perf_counter() - sent)
+            time.sleep(max(0.0, start + (i + 1) * interval - time.perf_counter()))
+        elapsed = time.perf_counter() - start
+        delivered = received[0] - first
+    finally:
+        node.stop()
+    latencies.sort()
+    return {
+        'devices': devices,
+        'load': load,
+        'offeredMsgPerSec': rate,
+        'deliveredMsgPerSec': round(delivered / elapsed),
+        'dropped': driver.dropped,
+        'commandP50Ms': round(latencies[len(latencies) // 2] * 1000, 3),
+        'commandP99Ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 3),
+        'commandMaxMs': round(latencies[-1] * 1000, 3),
+        'failures': [str(f) for f in failures],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--devices', type=int, default=30)
+    parser.add_argument('--load', type=float, action='append', help='Load factors to run, 1 and 10 by default')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds per load factor')
+    parser.add_argument('--commands', type=int, default=200, help='Commands sent per load factor')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = []
+    for load in args.load or [1, 10]:
+        result = run(args.devices, load, args.duration, args.commands)
+        results.append(result)
+        print('{devices} devices x{load:g}: {deliveredMsgPerSec}/{offeredMsgPerSec:g} msg/s, dropped {dropped}, '
+              'command p50 {commandP50Ms:.2f}ms p99 {commandP99Ms:.2f}ms max {commandMaxMs:.2f}ms'.format(**result))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
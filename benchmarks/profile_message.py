@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Per-message cost of building profile messages, with and without copying the BroadcastMessage
+the way ProfileMessage used to (deepcopy).
+
+    python3 benchmarks/profile_message.py
+"""
+import copy
+import timeit
+
+from libAnt.message import BroadcastMessage
+from libAnt.profiles.factory import Factory
+from libAnt.profiles.power_profile import PowerProfileMessage
+
+RAW = bytes.fromhex('001059a9412dc4e800e06c4a0b0510016d005a33')
+
+
+class CopyableBroadcastMessage(BroadcastMessage):
+    """ Falls back to the generic deepcopy, like BroadcastMessage did before it became immutable """
+    __deepcopy__ = None
+
+
+def perMessage(stmt, number: int) -> float:
+    """ :return: Best time of 5 runs per message (µs) """
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e6
+
+
+def main(number: int = 20000):
+    msg = BroadcastMessage(0x4E, RAW).build(RAW)
+    copyable = CopyableBroadcastMessage(0x4E, RAW).build(RAW)
+    previous = PowerProfileMessage(msg, None)
+    factory = Factory()
+
+    results = [
+        ('deepcopy(BroadcastMessage), before', perMessage(lambda: copy.deepcopy(copyable), number)),
+        ('PowerProfileMessage(), before', perMessage(lambda: PowerProfileMessage(copy.deepcopy(copyable), previous),
+                                                     number)),
+        ('PowerProfileMessage(), after', perMessage(lambda: PowerProfileMessage(msg, previous), number)),
+        ('Factory.parseMessage(), after', perMessage(lambda: factory.parseMessage(msg), number)),
+    ]
+    for name, us in results:
+        print('{:<40} {:8.2f} µs/msg'.format(name, us))
+
+
+if __name__ == '__main__':
+    main()
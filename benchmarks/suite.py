@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Benchmarks of every stage a message goes through: framing (Driver.read), broadcast parsing (BroadcastMessage.build),
+profile decoding (Factory.parseMessage) and logging (PcapLogger). Each stage runs against a synthetic stream and
+against the bundled demo captures, and reports:
+
+- msgPerSec: throughput of the stage, best of the repeats
+- p50Us, p90Us, p99Us, maxUs: per-message latency percentiles (µs), timed one call at a time
+- peakBytesPerMsg: average of the peak memory allocated while handling one message, freed or not
+- retainedBlocksPerMsg: memory blocks still allocated after the run, per message. Above 0 means the stage keeps
+  something for every message
+
+    python3 benchmarks/suite.py --output before.json
+    python3 benchmarks/suite.py --output after.json --compare before.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from queue import Empty
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from libAnt.constants import MESSAGE_CHANNEL_BROADCAST_DATA
+from libAnt.drivers.driver import Driver, FrameDecoder
+from libAnt.drivers.pcap import PcapReader
+from libAnt.loggers.pcap import PcapLogger
+from libAnt.message import BroadcastMessage
+from libAnt.profiles.factory import Factory
+
+DEMOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'demos')
+
+
+class BufferDriver(Driver):
+    """ Reads a list of byte chunks, as if they arrived from a device """
+
+    def __init__(self, chunks):
+        super().__init__()
+        self._chunks = chunks
+        self._next = 0
+        self._rx = bytearray()
+        self._isopen = False
+
+    def rewind(self):
+        self._next = 0
+        self._rx.clear()
+
+    def _isOpen(self) -> bool:
+        return self._isopen
+
+    def _open(self) -> None:
+        self._isopen = True
+
+    def _close(self) -> None:
+        self._isopen = False
+
+    def _nextChunk(self) -> bytes:
+        if self._next == len(self._chunks):
+            raise Empty
+        self._next += 1
+        return self._chunks[self._next - 1]
+
+    def _read(self, count: int, timeout=None) -> bytes:
+        while len(self._rx) < count:
+            self._rx += self._nextChunk()
+        data = bytes(self._rx[:count])
+        del self._rx[:count]
+        return data
+
+    def _readAvailable(self, timeout=None) -> bytes:
+        if self._rx:
+            data = bytes(self._rx)
+            self._rx.clear()
+            return data
+        return self._nextChunk()
+
+    def _write(self, data: bytes) -> None:
+        pass
+
+    def _abort(self) -> None:
+        pass
+
+
+def frame(type: int, content: bytes) -> bytes:
+    data = bytes([0xA4, len(content), type]) + content
+    chk = 0
+    for b in data:
+        chk ^= b
+    return data + bytes([chk])
+
+
+def syntheticFrames(devices: int = 30, messages: int = 20000) -> list:
+    """
+    :return: Extended broadcast frames (channel ID, RSSI and timestamp) of power meters, speed & cadence sensors and
+             heart rate monitors taking turns, with counters advancing like real devices
+    """
+    frames = []
+    for i in range(messages):
+        device = i % devices
+        step = i // devices
+        type = (11, 121, 120)[device % 3]
+        if type == 11:
+            power = 150 + step % 100
+            payload = bytes([0x10, step & 0xFF, 0xFF, 90, (step * power) & 0xFF, (step * power >> 8) & 0xFF,
+                             power & 0xFF, power >> 8])
+        elif type == 121:
+            eventTime = step * 1024 & 0xFFFF
+            payload = bytes([eventTime & 0xFF, eventTime >> 8, step & 0xFF, step >> 8 & 0xFF,
+                             eventTime & 0xFF, eventTime >> 8, step * 2 & 0xFF, step * 2 >> 8 & 0xFF])
+        else:
+            payload = bytes([0, 0, 0, 0, 0, 0, step & 0xFF, 60 + step % 100])
+        ext = bytes([0xE0, 100 + device, 0, type, 1, 0x20, 0xC0 + device % 20, 0xB0,
+                     step & 0xFF, step >> 8 & 0xFF])
+        frames.append(frame(MESSAGE_CHANNEL_BROADCAST_DATA, b'\x00' + payload + ext))
+    return frames
+
+
+def captureFrames(path: str) -> list:
+    with PcapReader(path) as reader:
+        return [data for ts, data in reader]
+
+
+def percentile(sortedValues: list, p: float) -> float:
+    return sortedValues[min(len(sortedValues) - 1, int(len(sortedValues) * p))]
+
+
+def measure(run, setup, messages: int, repeat: int) -> dict:
+    """
+    :param run: Handles every message once, calling tick() after each message
+    :param setup: Called before every run, to reset state
+    :param messages: Number of messages handled by a run
+    """
+    best = None
+    for i in range(repeat):
+        setup()
+        start = time.perf_counter()
+        run(lambda: None)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    # Latency of each message
+    latencies = []
+    clock = time.perf_counter_ns
+    last = [0]
+
+    def tick():
+        now = clock()
+        latencies.append(now - last[0])
+        last[0] = clock()
+
+    setup()
+    last[0] = clock()
+    run(tick)
+    latencies.sort()
+
+    # Memory, tracemalloc slows everything down so it gets a run of its own
+    setup()
+    gc.collect()
+    tracemalloc.start()
+    total = [0]
+    base = [0]
+
+    def trace():
+        current, peak = tracemalloc.get_traced_memory()
+        total[0] += peak - base[0]
+        tracemalloc.reset_peak()
+        base[0] = tracemalloc.get_traced_memory()[0]
+
+    blocks = sys.getallocatedblocks()
+    tracemalloc.reset_peak()
+    base[0] = tracemalloc.get_traced_memory()[0]
+    run(trace)
+    tracemalloc.stop()
+    gc.collect()
+    retained = sys.getallocatedblocks() - blocks
+
+    return {
+        'messages': messages,
+        'msgPerSec': round(messages / best),
+        'p50Us': round(percentile(latencies, 0.5) / 1000, 3),
+        'p90Us': round(percentile(latencies, 0.9) / 1000, 3),
+        'p99Us': round(percentile(latencies, 0.99) / 1000, 3),
+        'maxUs': round(latencies[-1] / 1000, 3),
+        'peakBytesPerMsg': round(total[0] / messages, 1),
+        'retainedBlocksPerMsg': round(retained / messages, 3),
+    }
+
+
+def framingBenchmark(frames: list, repeat: int) -> dict:
+    """ Driver.read, one frame per chunk like the serial driver delivers them """
+    driver = BufferDriver(frames)
+    driver.open()
+    count = len(frames)
+
+    def run(tick):
+        read = driver.read
+        for i in range(count):
+            read()
+            tick()
+
+    return measure(run, driver.rewind, count, repeat)
+
+
+def broadcastBenchmark(messages: list, repeat: int) -> dict:
+    """ BroadcastMessage.build, reading the fields every consumer reads """
+    broadcasts = [(msg.type, msg.content) for msg in messages if msg.type == MESSAGE_CHANNEL_BROADCAST_DATA]
+
+    def run(tick):
+        for type, content in broadcasts:
+            bmsg = BroadcastMessage(type, content).build(content)
+            bmsg.deviceNumber, bmsg.deviceType, bmsg.rssi
+            tick()
+
+    return measure(run, lambda: None, len(broadcasts), repeat)
+
+
+def profileBenchmark(messages: list, repeat: int) -> dict:
+    """ Factory.parseMessage, including the values the profile computes from the previous message """
+    broadcasts = [BroadcastMessage(msg.type, msg.content).build(msg.content) for msg in messages
+                  if msg.type == MESSAGE_CHANNEL_BROADCAST_DATA]
+    factory = Factory()
+
+    def run(tick):
+        parse = factory.parseMessage
+        for i, bmsg in enumerate(broadcasts):
+            parse(bmsg, i)
+            tick()
+
+    return measure(run, factory.reset, len(broadcasts), repeat)
+
+
+def loggingBenchmark(frames: list, repeat: int) -> dict:
+    """ PcapLogger.log, as called from Driver.read for every frame """
+    directory = tempfile.mkdtemp()
+    logger = PcapLogger(os.path.join(directory, 'bench.pcap'))
+
+    def setup():
+        logger.close()
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        logger.open()
+
+    def run(tick):
+        log = logger.log
+        for data in frames:
+            log(data)
+            tick()
+
+    try:
+        return measure(run, setup, len(frames), repeat)
+    finally:
+        logger.close()
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+STAGES = [
+    ('framing', framingBenchmark, 'frames'),
+    ('broadcast', broadcastBenchmark, 'messages'),
+    ('profile', profileBenchmark, 'messages'),
+    ('logging', loggingBenchmark, 'frames'),
+]
+
+
+def inputs(messages: int) -> dict:
+    frames = {'synthetic': syntheticFrames(messages=messages)}
+    for name in sorted(os.listdir(DEMOS)):
+        if name.endswith('.pcap'):
+            frames[name[:-5]] = captureFrames(os.path.join(DEMOS, name))
+    return frames
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'system': platform.system(),
+    }
+
+
+def compare(results: dict, baseline: dict) -> None:
+    print('\nCompared to {} ({}):'.format(baseline['environment'].get('commit'), baseline['environment']['time']))
+    for name, result in results['results'].items():
+        old = baseline['results'].get(name)
+        if old is None:
+            continue
+        print('{:<32} throughput {:+7.1%}  p99 {:+7.1%}'.format(
+            name, result['msgPerSec'] / old['msgPerSec'] - 1, result['p99Us'] / old['p99Us'] - 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of an earlier run to compare with')
+    parser.add_argument('--stage', action='append', choices=[s[0] for s in STAGES], help='Only run these stages')
+    parser.add_argument('--messages', type=int, default=20000, help='Length of the synthetic stream')
+    parser.add_argument('--repeat', type=int, default=5, help='Throughput runs, the best one counts')
+    args = parser.parse_args()
+
+    streams = inputs(args.messages)
+    decoded = {name: FrameDecoder().decode(b''.join(frames)) for name, frames in streams.items()}
+    results = {}
+    for stage, benchmark, kind in STAGES:
+        if args.stage and stage not in args.stage:
+            continue
+        for name in streams:
+            data = streams[name] if kind == 'frames' else decoded[name]
+            result = benchmark(data, args.repeat)
+            key = '{}/{}'.format(stage, name)
+            results[key] = result
+            print('{:<32} {msgPerSec:>9} msg/s  p50 {p50Us:7.2f}µs  p99 {p99Us:7.2f}µs  max {maxUs:9.2f}µs  '
+                  'peak {peakBytesPerMsg:7.1f}B/msg  retained {retainedBlocksPerMsg:6.3f}blk/msg'
+                  .format(key, **result))
+
+    output = {'environment': environment(), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(output, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,6 @@
+#!/usr/bin/env python3
+from libAnt.capture import readProfileMessages
+
+# Decodes the whole capture straight away, no Node or driver threads involved
+for msg in readProfileMessages('demos/demo-capture-1.pcap'):
+    print(msg)
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+import asyncio
+
+from libAnt.async_node import AsyncNode
+from libAnt.drivers.serial import SerialDriver
+from libAnt.profiles.factory import Factory
+
+
+async def main():
+    f = Factory()
+    async with AsyncNode(SerialDriver('/dev/ttyUSB0'), 'AsyncNode1') as n:
+        n.enableRxScanMode()
+        await n.start()
+        async for msg in n:
+            pmsg = f.parseMessage(msg)
+            if pmsg is not None:
+                print(pmsg)
+
+
+asyncio.run(main())
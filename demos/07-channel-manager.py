@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+from time import sleep
+
+from libAnt.channels import ChannelManager
+from libAnt.drivers.serial import SerialDriver
+from libAnt.node import Node
+from libAnt.profiles.factory import Factory
+
+
+def callback(msg):
+    print(msg)
+
+
+def eCallback(e):
+    print(e)
+
+
+with Node(SerialDriver('/dev/ttyUSB0'), 'ChannelNode1') as n:
+    f = Factory(callback)
+    channels = ChannelManager(n)
+    n.start(channels.dispatch, eCallback)
+    channels.requestCapabilities()
+    channels.open(19052, 11, f.parseMessage)  # Power meter
+    channels.open(19052, 121, f.parseMessage)  # Speed and cadence sensor
+    sleep(30)  # Listen for 30sec
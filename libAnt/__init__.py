@@ -1 +1 @@
-__all__ = ['message', 'node', 'driver', 'constants', 'profiles']
+__all__ = ['message', 'node', 'driver', 'constants', 'profiles', 'capture', 'async_node', 'channels', 'metrics', 'link_quality']
@@ -0,0 +1,200 @@
+"""
+Columnar decoding of captures into NumPy structured arrays, for analysing whole sessions at once.
+Requires numpy (pip install libant[numpy]).
+
+    broadcasts = readBroadcastArray('demos/demo-capture-1.pcap')
+    power = powerArray(broadcasts)
+    print(power['averagePower'].mean())
+"""
+
+import numpy as np
+
+from libAnt.capture import readMessages
+from libAnt.constants import *
+from libAnt.profiles.power_profile import PowerProfileMessage
+from libAnt.profiles.speed_cadence_profile import SpeedAndCadenceProfileMessage
+
+broadcastDtype = np.dtype([
+    ('timestamp', 'f8'),  # Capture time
+    ('channel', 'u1'),
+    ('flag', 'u1'),  # Extended message flags, fields not flagged here are 0
+    ('deviceNumber', 'u2'),
+    ('deviceType', 'u1'),
+    ('transType', 'u1'),
+    ('rssiMeasurementType', 'u1'),
+    ('rssi', 'u1'),
+    ('rssiThreshold', 'u1'),
+    ('rxTimestamp', 'u8'),
+    ('content', 'u1', 8),
+])
+
+powerDtype = np.dtype([
+    ('timestamp', 'f8'),
+    ('deviceNumber', 'u2'),
+    ('rssi', 'u1'),
+    ('rxTimestamp', 'u8'),
+    ('dataPageNumber', 'u1'),
+    ('eventCount', 'u1'),
+    ('instantaneousCadence', 'u1'),
+    ('accumulatedPower', 'u2'),
+    ('instantaneousPower', 'u2'),
+    ('accumulatedPowerDiff', 'f8'),  # NaN for the first message of a device
+    ('eventCountDiff', 'f8'),  # NaN for the first message of a device
+    ('averagePower', 'f8'),
+])
+
+speedCadenceDtype = np.dtype([
+    ('timestamp', 'f8'),
+    ('deviceNumber', 'u2'),
+    ('rssi', 'u1'),
+    ('rxTimestamp', 'u8'),
+    ('cadenceEventTime', 'u2'),
+    ('cumulativeCadenceRevolutionCount', 'u2'),
+    ('speedEventTime', 'u2'),
+    ('cumulativeSpeedRevolutionCount', 'u2'),
+    ('cadenceEventTimeDiff', 'i4'),
+    ('cadenceRevCountDiff', 'i4'),
+    ('speedEventTimeDiff', 'i4'),
+    ('speedRevCountDiff', 'i4'),
+])
+
+_maxBroadcastLength = 32
+
+
+def readBroadcastArray(source) -> np.ndarray:
+    """
+    :param source: Path of a pcap capture, or the capture itself as a bytes-like object
+    :return: Structured array (broadcastDtype) with one row per broadcast message
+    """
+    timestamps = []
+    lengths = []
+    padded = []
+    for ts, msg in readMessages(source, withTimestamp=True):
+        if msg.type == MESSAGE_CHANNEL_BROADCAST_DATA:
+            content = msg.content[:_maxBroadcastLength]
+            timestamps.append(ts)
+            lengths.append(len(content))
+            padded.append(content.ljust(_maxBroadcastLength, b'\x00'))
+
+    n = len(padded)
+    result = np.zeros(n, dtype=broadcastDtype)
+    if n == 0:
+        return result
+    raw = np.frombuffer(b''.join(padded), dtype=np.uint8).reshape(n, _maxBroadcastLength)
+    lengths = np.array(lengths)
+    rows = np.arange(n)
+
+    result['timestamp'] = timestamps
+    result['channel'] = raw[:, 0]
+    result['content'] = raw[:, 1:9]
+    flag = np.where(lengths > 9, raw[:, 9], 0).astype(np.uint8)
+    result['flag'] = flag
+
+    hasId = (flag & EXT_FLAG_CHANNEL_ID) != 0
+    result['deviceNumber'] = np.where(hasId, raw[:, 10].astype(np.uint16) | (raw[:, 11].astype(np.uint16) << 8), 0)
+    result['deviceType'] = np.where(hasId, raw[:, 12], 0)
+    result['transType'] = np.where(hasId, raw[:, 13], 0)
+
+    offset = 10 + np.where(hasId, 4, 0)
+    hasRssi = (flag & EXT_FLAG_RSSI) != 0
+    rssiOffset = np.minimum(offset, _maxBroadcastLength - 3)
+    result['rssiMeasurementType'] = np.where(hasRssi, raw[rows, rssiOffset], 0)
+    result['rssi'] = np.where(hasRssi, raw[rows, rssiOffset + 1], 0)
+    result['rssiThreshold'] = np.where(hasRssi, raw[rows, rssiOffset + 2], 0)
+
+    # The timestamp takes up the rest of the message, little endian
+    offset += np.where(hasRssi, 3, 0)
+    hasTimestamp = (flag & EXT_FLAG_TIMESTAMP) != 0
+    remaining = np.where(hasTimestamp, lengths - offset, 0)
+    rxTimestamp = np.zeros(n, dtype=np.uint64)
+    for k in range(int(remaining.max(initial=0))):
+        col = np.minimum(offset + k, _maxBroadcastLength - 1)
+        byte = np.where(k < remaining, raw[rows, col], 0).astype(np.uint64)
+        rxTimestamp |= byte << np.uint64(8 * k)
+    result['rxTimestamp'] = rxTimestamp
+    return result
+
+
+def _previousIndex(keys: np.ndarray) -> np.ndarray:
+    """
+    :return: Index of the previous row with the same key, or -1 for the first row of each key
+    """
+    order = np.argsort(keys, kind='stable')
+    sortedKeys = keys[order]
+    previous = np.full(len(keys), -1, dtype=np.intp)
+    same = sortedKeys[1:] == sortedKeys[:-1]
+    previous[order[1:][same]] = order[:-1][same]
+    return previous
+
+
+def _rolloverDiff(values: np.ndarray, previous: np.ndarray, maximum: int) -> np.ndarray:
+    """
+    :return: Difference to the previous value of the same device, corrected for rollover. 0 where there is none.
+    """
+    values = values.astype(np.int64)
+    diff = (values - values[np.maximum(previous, 0)]) % maximum
+    diff[previous < 0] = 0
+    return diff
+
+
+def _select(broadcasts: np.ndarray, deviceType: int, dtype: np.dtype):
+    rows = broadcasts[broadcasts['deviceType'] == deviceType]
+    result = np.zeros(len(rows), dtype=dtype)
+    for name in ('timestamp', 'deviceNumber', 'rssi', 'rxTimestamp'):
+        result[name] = rows[name]
+    return rows, result
+
+
+def powerArray(broadcasts: np.ndarray) -> np.ndarray:
+    """
+    Decodes the power-only pages (0x10) of every power meter, like PowerProfileMessage does
+    :param broadcasts: Array returned by readBroadcastArray
+    :return: Structured array (powerDtype), in capture order
+    """
+    rows, result = _select(broadcasts, 11, powerDtype)
+    pageFilter = rows['content'][:, 0] == 16
+    rows, result = rows[pageFilter], result[pageFilter]
+    content = rows['content'].astype(np.uint16)
+
+    result['dataPageNumber'] = content[:, 0]
+    result['eventCount'] = content[:, 1]
+    result['instantaneousCadence'] = content[:, 3]
+    result['accumulatedPower'] = (content[:, 5] << 8) | content[:, 4]
+    result['instantaneousPower'] = (content[:, 7] << 8) | content[:, 6]
+
+    previous = _previousIndex(result['deviceNumber'])
+    first = previous < 0
+    powerDiff = _rolloverDiff(result['accumulatedPower'], previous, PowerProfileMessage.maxAccumulatedPower)
+    eventDiff = _rolloverDiff(result['eventCount'], previous, PowerProfileMessage.maxEventCount)
+    result['accumulatedPowerDiff'] = np.where(first, np.nan, powerDiff)
+    result['eventCountDiff'] = np.where(first, np.nan, eventDiff)
+    instantaneous = result['instantaneousPower'].astype(np.float64)
+    useInstantaneous = first | (eventDiff == 0)
+    result['averagePower'] = np.where(useInstantaneous, instantaneous,
+                                      powerDiff / np.where(useInstantaneous, 1, eventDiff))
+    return result
+
+
+def speedCadenceArray(broadcasts: np.ndarray) -> np.ndarray:
+    """
+    Decodes every speed and cadence sensor message, like SpeedAndCadenceProfileMessage does
+    :param broadcasts: Array returned by readBroadcastArray
+    :return: Structured array (speedCadenceDtype), in capture order
+    """
+    rows, result = _select(broadcasts, 121, speedCadenceDtype)
+    content = rows['content'].astype(np.uint16)
+
+    result['cadenceEventTime'] = (content[:, 1] << 8) | content[:, 0]
+    result['cumulativeCadenceRevolutionCount'] = (content[:, 3] << 8) | content[:, 2]
+    result['speedEventTime'] = (content[:, 5] << 8) | content[:, 4]
+    result['cumulativeSpeedRevolutionCount'] = (content[:, 7] << 8) | content[:, 6]
+
+    previous = _previousIndex(result['deviceNumber'])
+    profile = SpeedAndCadenceProfileMessage
+    result['cadenceEventTimeDiff'] = _rolloverDiff(result['cadenceEventTime'], previous, profile.maxCadenceEventTime)
+    result['cadenceRevCountDiff'] = _rolloverDiff(result['cumulativeCadenceRevolutionCount'], previous,
+                                                  profile.maxCadenceRevCount)
+    result['speedEventTimeDiff'] = _rolloverDiff(result['speedEventTime'], previous, profile.maxSpeedEventTime)
+    result['speedRevCountDiff'] = _rolloverDiff(result['cumulativeSpeedRevolutionCount'], previous,
+                                                profile.maxSpeedRevCount)
+    return result
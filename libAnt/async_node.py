@@ -0,0 +1,129 @@
+import asyncio
+from queue import Empty
+
+from libAnt.drivers.driver import Driver
+from libAnt.message import *
+from libAnt.node import rxScanModeMessages
+
+
+class AsyncNode:
+    """
+    asyncio counterpart of Node. There is no pump thread: the event loop watches the driver's file descriptor
+    and decodes whatever is available when it becomes readable, so one loop can serve many devices.
+    Drivers without a file descriptor are read through the loop's default executor.
+
+        async with AsyncNode(SerialDriver('/dev/ttyUSB0')) as n:
+            n.enableRxScanMode()
+            await n.start()
+            async for msg in n:
+                print(msg)
+    """
+
+    def __init__(self, driver: Driver, name: str = None):
+        self._driver = driver
+        self._name = name
+        self._init = []
+        self._loop = None
+        self._messages = None
+        self._fd = None
+        self._reader = None
+        self._running = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> BroadcastMessage:
+        if self._messages is None:
+            raise StopAsyncIteration
+        msg = await self._messages.get()
+        if msg is None:
+            self._messages.put_nowait(None)  # Let other iterators finish too
+            raise StopAsyncIteration
+        if isinstance(msg, Exception):
+            self._messages.put_nowait(None)  # The node has stopped, end the iteration after the error
+            raise msg
+        return msg
+
+    def enableRxScanMode(self, networkKey=ANTPLUS_NETWORK_KEY, channelType=CHANNEL_TYPE_ONEWAY_RECEIVE,
+                         frequency: int = 2457, rxTimestamp: bool = True, rssi: bool = True, channelId: bool = True):
+        self._init.extend(rxScanModeMessages(networkKey, channelType, frequency, rxTimestamp, rssi, channelId))
+
+    async def start(self) -> None:
+        if self._running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._messages = asyncio.Queue()
+        await self._loop.run_in_executor(None, self._driver.open)
+        self._running = True
+
+        self._fd = self._driver.fileno()
+        if self._fd is not None:
+            self._loop.add_reader(self._fd, self._onReadable)
+        else:
+            self._reader = self._loop.create_task(self._readLoop())
+
+        await self.write(SystemResetMessage())
+        for m in self._init:
+            await self.write(m)
+
+    async def write(self, msg: Message) -> None:
+        await self._loop.run_in_executor(None, self._driver.write, msg)
+
+    async def stop(self) -> None:
+        if not self._running:
+            return
+        self._detach()
+        self._driver.abort()
+        await self._loop.run_in_executor(None, self._driver.close)
+        self._messages.put_nowait(None)
+
+    def isRunning(self) -> bool:
+        return self._running
+
+    def _detach(self) -> None:
+        self._running = False
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            self._fd = None
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+
+    def _onReadable(self) -> None:
+        try:
+            messages = self._driver.readAll(timeout=0)
+        except Empty:
+            return
+        except Exception as e:
+            self._fail(e)
+            return
+        self._dispatch(messages)
+
+    async def _readLoop(self) -> None:
+        while self._running:
+            try:
+                messages = await self._loop.run_in_executor(None, self._driver.readAll, 1)
+            except Empty:
+                continue
+            except Exception as e:
+                self._fail(e)
+                return
+            self._dispatch(messages)
+
+    def _dispatch(self, messages) -> None:
+        for msg in messages:
+            if msg.type == MESSAGE_CHANNEL_BROADCAST_DATA:
+                try:
+                    self._messages.put_nowait(BroadcastMessage(msg.type, msg.content).build(msg.content))
+                except ValueError:
+                    pass  # Truncated extended data
+
+    def _fail(self, e: Exception) -> None:
+        self._detach()
+        self._messages.put_nowait(e)
@@ -0,0 +1,293 @@
+"""
+Synchronous decoding of recorded captures, without starting a Node, threads or queues.
+
+    for msg in readProfileMessages('demos/demo-capture-1.pcap'):
+        print(msg)
+"""
+
+import os
+import sys
+from array import array
+from bisect import bisect_left
+from struct import Struct, error as StructError
+
+from libAnt.constants import MESSAGE_CHANNEL_BROADCAST_DATA
+from libAnt.drivers.driver import DriverException, FrameDecoder
+from libAnt.drivers.pcap import PcapReader
+from libAnt.message import BroadcastMessage
+from libAnt.profiles.factory import Factory
+
+
+def _broadcast(msg):
+    """ :return: The BroadcastMessage of a broadcast data message, None if its extended data is truncated """
+    try:
+        return BroadcastMessage(msg.type, msg.content).build(msg.content)
+    except ValueError:
+        return None
+
+
+def readMessages(source, withTimestamp: bool = False):
+    """
+    :param source: Path of a pcap capture, or the capture itself as a bytes-like object
+    :param withTimestamp: Yield (capture timestamp, message) tuples instead of messages
+    :return: Generator of every valid message in the capture
+    """
+    decoder = FrameDecoder()
+    with PcapReader(source) as reader:
+        for ts, data in reader:
+            for msg in decoder.decode(data):
+                yield (ts, msg) if withTimestamp else msg
+
+
+def readBroadcasts(source, withTimestamp: bool = False):
+    """
+    :param source: Path of a pcap capture, or the capture itself as a bytes-like object
+    :param withTimestamp: Yield (capture timestamp, message) tuples instead of messages
+    :return: Generator of the BroadcastMessages in the capture
+    """
+    for ts, msg in readMessages(source, withTimestamp=True):
+        if msg.type == MESSAGE_CHANNEL_BROADCAST_DATA:
+            bmsg = _broadcast(msg)
+            if bmsg is not None:
+                yield (ts, bmsg) if withTimestamp else bmsg
+
+
+def readProfileMessages(source, factory: Factory = None):
+    """
+    Profile messages are timestamped with the capture time, so averages match the original session.
+    :param source: Path of a pcap capture, or the capture itself as a bytes-like object
+    :param factory: Factory to decode with, its filter and callback are honoured. A new one is used if omitted.
+    :return: Generator of the decoded profile messages in the capture
+    """
+    if factory is None:
+        factory = Factory()
+    for ts, bmsg in readBroadcasts(source, withTimestamp=True):
+        pmsg = factory.parseMessage(bmsg, ts)
+        if pmsg is not None:
+            yield pmsg
+
+
+class CaptureIndex:
+    """
+    Index of the broadcasts in a pcap capture, to read a time range and/or a device without scanning the whole file.
+    For every device it keeps the timestamp and file offset of each broadcast, and for every time bucket the offset
+    of its first packet, so a query costs time proportional to the size of its result.
+    Timestamps are capture timestamps (seconds since the epoch), the capture starts at index.start.
+
+        index = CaptureIndex.open('session.pcap')  # Builds session.pcap.idx the first time
+        for ts, msg in index.read(index.start + 40 * 60, index.start + 42 * 60, deviceNumber=12345):
+            print(msg)
+    """
+
+    magic = b'LIBANTIX'
+    _header = Struct('<8sdqqII')  # magic, bucket size, capture size, capture mtime (ns), bucket count, device count
+    _bucket = Struct('<qQ')  # bucket number, offset
+    _device = Struct('<HBI')  # device number, device type, broadcast count
+
+    def __init__(self, source, bucketSize: float = 60.0):
+        """
+        Use build, load or open instead
+        """
+        self._source = source
+        self.bucketSize = bucketSize
+        self.buckets = {}  # Bucket number -> offset of its first packet
+        self.devices = {}  # (deviceNumber, deviceType) -> (array of timestamps, array of offsets)
+        self._stat = self._statSource(source)
+
+    @property
+    def start(self) -> float:
+        """ Timestamp of the first broadcast in the capture, or None if there are none """
+        starts = [timestamps[0] for timestamps, offsets in self.devices.values()]
+        return min(starts) if starts else None
+
+    @property
+    def end(self) -> float:
+        """ Timestamp of the last broadcast in the capture, or None if there are none """
+        ends = [timestamps[-1] for timestamps, offsets in self.devices.values()]
+        return max(ends) if ends else None
+
+    @staticmethod
+    def _statSource(source):
+        if not isinstance(source, str):
+            return len(source), 0
+        st = os.stat(source)
+        return st.st_size, st.st_mtime_ns
+
+    @classmethod
+    def build(cls, source, bucketSize: float = 60.0):
+        """
+        Scans the whole capture once
+        :param source: Path of a pcap capture, or the capture itself as a bytes-like object
+        :param bucketSize: Length of the time buckets (s)
+        """
+        index = cls(source, bucketSize)
+        decoder = FrameDecoder()
+        # Offset of the packet the bytes held back by the decoder started in, so frames can be decoded from there
+        frameStart = None
+        with PcapReader(source) as reader:
+            for offset, ts, data in reader.packets():
+                bucket = int(ts // bucketSize)
+                if bucket not in index.buckets:
+                    index.buckets[bucket] = offset
+                if not len(decoder):
+                    frameStart = offset
+                for msg in decoder.decode(data):
+                    if msg.type == MESSAGE_CHANNEL_BROADCAST_DATA:
+                        bmsg = _broadcast(msg)
+                        if bmsg is not None and bmsg.deviceNumber is not None:
+                            key = (bmsg.deviceNumber, bmsg.deviceType)
+                            if key not in index.devices:
+                                index.devices[key] = (array('d'), array('Q'))
+                            timestamps, offsets = index.devices[key]
+                            timestamps.append(ts)
+                            offsets.append(frameStart)
+                    frameStart = offset
+        for key, (timestamps, offsets) in index.devices.items():
+            if any(timestamps[i] > timestamps[i + 1] for i in range(len(timestamps) - 1)):
+                records = sorted(zip(timestamps, offsets))
+                index.devices[key] = (array('d', (r[0] for r in records)), array('Q', (r[1] for r in records)))
+        return index
+
+    @classmethod
+    def load(cls, source: str, path: str = None):
+        """
+        :param source: Path of the pcap capture
+        :param path: Path of the index, source + '.idx' if omitted
+        :raises DriverException: If the index is missing, invalid, or the capture has changed since it was built
+        """
+        if path is None:
+            path = source + '.idx'
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            raise DriverException("Could not read capture index: {}".format(e))
+        try:
+            magic, bucketSize, size, mtime, bucketCount, deviceCount = cls._header.unpack_from(data)
+            if magic != cls.magic:
+                raise DriverException("Not a capture index")
+            index = cls(source, bucketSize)
+            if index._stat != (size, mtime):
+                raise DriverException("Capture has changed since it was indexed")
+            pos = cls._header.size
+            for i in range(bucketCount):
+                bucket, offset = cls._bucket.unpack_from(data, pos)
+                index.buckets[bucket] = offset
+                pos += cls._bucket.size
+            for i in range(deviceCount):
+                num, type, count = cls._device.unpack_from(data, pos)
+                pos += cls._device.size
+                timestamps, offsets = array('d'), array('Q')
+                timestamps.frombytes(data[pos:pos + 8 * count])
+                pos += 8 * count
+                offsets.frombytes(data[pos:pos + 8 * count])
+                pos += 8 * count
+                if len(timestamps) != count or len(offsets) != count:
+                    raise DriverException("Capture index is truncated")
+                if sys.byteorder == 'big':
+                    timestamps.byteswap()
+                    offsets.byteswap()
+                index.devices[(num, type)] = (timestamps, offsets)
+        except (StructError, ValueError, EOFError) as e:
+            raise DriverException("Invalid capture index: {}".format(e))
+        return index
+
+    @classmethod
+    def open(cls, source: str, bucketSize: float = 60.0, path: str = None):
+        """
+        Loads the index of the capture, building and saving it first if it is missing or out of date
+        """
+        try:
+            return cls.load(source, path)
+        except DriverException:
+            index = cls.build(source, bucketSize)
+            index.save(path)
+            return index
+
+    def save(self, path: str = None) -> None:
+        """
+        :param path: Path of the index, the path of the capture + '.idx' if omitted
+        """
+        if path is None:
+            if not isinstance(self._source, str):
+                raise DriverException("Index of an in-memory capture needs a path")
+            path = self._source + '.idx'
+        size, mtime = self._stat
+        with open(path, 'wb') as f:
+            f.write(self._header.pack(self.magic, self.bucketSize, size, mtime, len(self.buckets), len(self.devices)))
+            for bucket, offset in sorted(self.buckets.items()):
+                f.write(self._bucket.pack(bucket, offset))
+            for (num, type), (timestamps, offsets) in self.devices.items():
+                f.write(self._device.pack(num, type, len(timestamps)))
+                if sys.byteorder == 'big':
+                    timestamps, offsets = array('d', timestamps), array('Q', offsets)
+                    timestamps.byteswap()
+                    offsets.byteswap()
+                f.write(timestamps.tobytes())
+                f.write(offsets.tobytes())
+
+    def read(self, start: float = None, end: float = None, deviceNumber: int = None, deviceType: int = None):
+        """
+        :param start: Only broadcasts at or after this timestamp
+        :param end: Only broadcasts before this timestamp
+        :param deviceNumber: Only broadcasts of this device number
+        :param deviceType: Only broadcasts of this device type
+        :return: Generator of (timestamp, BroadcastMessage) tuples, in capture order
+        """
+        def match(ts, bmsg):
+            if start is not None and ts < start:
+                return False
+            if end is not None and ts >= end:
+                return False
+            if deviceNumber is not None and bmsg.deviceNumber != deviceNumber:
+                return False
+            if deviceType is not None and bmsg.deviceType != deviceType:
+                return False
+            return True
+
+        with PcapReader(self._source) as reader:
+            if deviceNumber is None and deviceType is None:
+                yield from self._scan(reader, start, end, match)
+                return
+            offsets = set()
+            for (num, type), (timestamps, devOffsets) in self.devices.items():
+                if (deviceNumber is None or num == deviceNumber) and (deviceType is None or type == deviceType):
+                    first = 0 if start is None else bisect_left(timestamps, start)
+                    last = len(timestamps) if end is None else bisect_left(timestamps, end)
+                    offsets.update(devOffsets[first:last])
+            position = 0
+            for offset in sorted(offsets):
+                if offset < position:
+                    continue  # Decoded along with the previous one
+                decoder = FrameDecoder()
+                for packetOffset, ts, data in reader.packets(offset):
+                    for ts, bmsg in self._broadcasts(ts, decoder.decode(data)):
+                        if match(ts, bmsg):
+                            yield ts, bmsg
+                    position = packetOffset + 1
+                    if not len(decoder):
+                        break
+
+    def _scan(self, reader, start, end, match):
+        offset = None
+        if start is not None:
+            first = int(start // self.bucketSize)
+            later = [b for b in self.buckets if b >= first]
+            if not later:
+                return
+            offset = self.buckets[min(later)]
+        decoder = FrameDecoder()
+        for packetOffset, ts, data in reader.packets(offset):
+            if end is not None and ts >= end and not len(decoder):
+                return
+            for ts, bmsg in self._broadcasts(ts, decoder.decode(data)):
+                if match(ts, bmsg):
+                    yield ts, bmsg
+
+    @staticmethod
+    def _broadcasts(ts, messages):
+        for msg in messages:
+            if msg.type == MESSAGE_CHANNEL_BROADCAST_DATA:
+                bmsg = _broadcast(msg)
+                if bmsg is not None:
+                    yield ts, bmsg
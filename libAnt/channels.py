@@ -0,0 +1,129 @@
+from threading import Lock
+
+from libAnt.message import *
+from libAnt.node import Node
+
+
+class ChannelException(Exception):
+    pass
+
+
+class Channel:
+    """
+    A channel dedicated to one device. Messages of the device are passed to handler.
+    """
+
+    profilePeriods = ANTPLUS_PROFILE_PERIODS
+
+    def __init__(self, number: int, deviceNumber: int, deviceType: int, handler, transType: int = 0,
+                 period: int = None, frequency: int = 2457, searchTimeout: int = TIMEOUT_NEVER,
+                 channelType: int = CHANNEL_TYPE_TWOWAY_RECEIVE, network: int = 0):
+        self.number = number
+        self.deviceNumber = deviceNumber
+        self.deviceType = deviceType
+        self.transType = transType
+        self.handler = handler
+        self.period = period if period is not None else self.profilePeriods.get(deviceType, 8192)
+        self.frequency = frequency
+        self.searchTimeout = searchTimeout
+        self.channelType = channelType
+        self.network = network
+        self.configMessages = [
+            AssignChannelMessage(number, channelType, network),
+            SetChannelIdMessage(number, deviceNumber, deviceType, transType),
+            SetChannelPeriodMessage(number, self.period),
+            SetChannelSearchTimeoutMessage(number, searchTimeout),
+            SetChannelRfFrequencyMessage(number, frequency),
+            OpenChannelMessage(number),
+        ]
+
+    def __str__(self):
+        return 'Channel {}: device {} type {}'.format(self.number, self.deviceNumber, self.deviceType)
+
+
+class ChannelManager:
+    """
+    Tracks several devices at once, each on a channel of its own, instead of sharing a single scan mode channel.
+    Pass dispatch to Node.start as the success callback; it routes every broadcast to its channel's handler.
+
+        n = Node(SerialDriver('/dev/ttyUSB0'))
+        channels = ChannelManager(n)
+        n.start(channels.dispatch, onFailure)
+        channels.requestCapabilities()
+        channels.open(19052, 11, onPowerMessage)
+    """
+
+    def __init__(self, node: Node, maxChannels: int = 8, networkKey: bytes = ANTPLUS_NETWORK_KEY, onUnknown=None,
+                 rxTimestamp: bool = True, rssi: bool = True):
+        """
+        :param maxChannels: Number of channels of the device, requestCapabilities() reads it from the device
+        :param onUnknown: Called with broadcasts on channels which are not managed here
+        :param rxTimestamp: Include the rx timestamp in the broadcasts
+        :param rssi: Include the RSSI in the broadcasts
+        """
+        self._node = node
+        self._lock = Lock()
+        self._channels = [None] * maxChannels
+        self._onUnknown = onUnknown
+        # Broadcasts carry the channel ID as extended data, so profiles can be decoded from them like in scan mode
+        node.configure([
+            SetNetworkKeyMessage(0, networkKey),
+            EnableExtendedMessagesMessage(),
+            LibConfigMessage(rxTimestamp, rssi, True),
+        ])
+
+    def __len__(self):
+        return sum(1 for c in self._channels if c is not None)
+
+    def __iter__(self):
+        return iter([c for c in self._channels if c is not None])
+
+    @property
+    def maxChannels(self) -> int:
+        return len(self._channels)
+
+    def requestCapabilities(self, timeout: float = 5.0) -> int:
+        """
+        Asks the device how many channels it has. The node has to be running.
+        :return: The number of channels available
+        """
+        capabilities = self._node.getCapabilities().result(timeout)
+        maxChannels = capabilities.content[0]
+        with self._lock:
+            if maxChannels < len(self._channels) and any(self._channels[maxChannels:]):
+                raise ChannelException('Channels above {} are already in use'.format(maxChannels - 1))
+            self._channels = (self._channels + [None] * maxChannels)[:maxChannels]
+        return maxChannels
+
+    def open(self, deviceNumber: int, deviceType: int, handler, **kwargs) -> Channel:
+        """
+        Opens the lowest free channel for a device, keyword arguments are passed to Channel
+        :return: The channel. Its configuration is sent right away if the node is running, otherwise on start.
+        """
+        with self._lock:
+            try:
+                number = self._channels.index(None)
+            except ValueError:
+                raise ChannelException('All {} channels are in use'.format(len(self._channels)))
+            channel = Channel(number, deviceNumber, deviceType, handler, **kwargs)
+            self._channels[number] = channel
+        self._node.configure(channel.configMessages)
+        return channel
+
+    def close(self, channel: Channel) -> None:
+        with self._lock:
+            if self._channels[channel.number] is not channel:
+                raise ChannelException('{} is not open'.format(channel))
+            self._channels[channel.number] = None
+        self._node.unconfigure(channel.configMessages)
+        if self._node.isRunning():
+            closed = self._node.write(CloseChannelMessage(channel.number))
+            closed.add_done_callback(lambda f: self._node.write(UnassignChannelMessage(channel.number)))
+
+    def dispatch(self, msg: BroadcastMessage) -> None:
+        channels = self._channels
+        channel = channels[msg.channel] if msg.channel < len(channels) else None
+        if channel is not None:
+            channel.handler(msg)
+        elif self._onUnknown is not None:
+            self._onUnknown(msg)
@@ -1,5 +1,6 @@
 MESSAGE_TX_SYNC = 0xA4
 MESSAGE_TX_SYNC_LEGACY = 0xA5
+MESSAGE_MAX_LENGTH = 41  # Longest message content a device will send
 
 # Configuration messages
 MESSAGE_CHANNEL_UNASSIGN = 0x41  # [Channel number]
@@ -122,6 +123,13 @@ ANTPLUS_NETWORK_KEY = b'\xB9\xA5\x21\xFB\xBD\x72\xC3\x45'
 ANTFS_KEY = b'\xA8\xA4\x23\xB9\xF5\x5E\x63\xC1'
 PUBLIC_NETWORK_KEY = b'\xE8\xE4\x21\x3B\x55\x7A\x67\xC1'
 
+# Message periods of the ANT+ device profiles (1/32768 sec), by device type
+ANTPLUS_PROFILE_PERIODS = {
+    120: 8070,  # Heart rate
+    121: 8086,  # Speed and cadence
+    11: 8182,  # Power
+}
+
 # Extended message flags
 EXT_FLAG_CHANNEL_ID = 0x80
 EXT_FLAG_RSSI = 0x40
@@ -1,10 +1,254 @@
+import threading
+import time
+import traceback
+from collections import deque, OrderedDict
+from queue import Empty, Full
+
+BLOCK = 'block'
+DROP_OLDEST = 'drop-oldest'
+KEEP_LATEST = 'keep-latest'
+
+
 def lazyproperty(fn):
+    """
+    Property which is computed once, then cached in the instance's __dict__. Instances of classes with __slots__ have
+    no __dict__, they cache it in a slot named '_lazy_' + the property name if the class declares one.
+    """
     attr_name = '__' + fn.__name__
+    slot_name = '_lazy_' + fn.__name__
 
     @property
     def _lazyprop(self):
-        if not hasattr(self, attr_name):
-            setattr(self, attr_name, fn(self))
-        return getattr(self, attr_name)
+        try:
+            values = self.__dict__
+        except AttributeError:
+            try:
+                return getattr(self, slot_name)
+            except AttributeError:
+                value = fn(self)
+                try:
+                    setattr(self, slot_name, value)
+                except AttributeError:
+                    pass  # No slot to cache it in
+                return value
+        if attr_name not in values:
+            values[attr_name] = fn(self)
+        return values[attr_name]
 
     return _lazyprop
+
+
+def reportError(onError, e: Exception) -> None:
+    """ Passes an exception raised on a delivery thread to onError, or prints it if there is no onError """
+    if onError is None:
+        traceback.print_exception(type(e), e, e.__traceback__)
+        return
+    try:
+        onError(e)
+    except Exception:
+        traceback.print_exc()
+
+
+class BatchCallback:
+    """
+    Turns a callback which takes a list of messages into one which can be called with each message.
+    Messages are collected and delivered in batches of up to maxSize, at most maxDelay seconds after the first
+    message of the batch arrived. Batches are delivered in order, on a thread of their own.
+    Exceptions raised by the callback are passed to onError (printed if it is None) and delivery goes on.
+    """
+
+    def __init__(self, callback, maxSize: int = 100, maxDelay: float = 0.05, onError=None):
+        self._callback = callback
+        self._onError = onError
+        self._maxSize = maxSize
+        self._maxDelay = maxDelay
+        self._batch = []
+        self._deadline = None
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def __call__(self, msg):
+        with self._condition:
+            self._batch.append(msg)
+            if len(self._batch) == 1:
+                self._deadline = time.monotonic() + self._maxDelay
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._deliver, daemon=True)
+                    self._thread.start()
+                self._condition.notify()
+            elif len(self._batch) == self._maxSize:
+                self._condition.notify()
+
+    def flush(self) -> None:
+        """ Delivers the messages collected so far without waiting for the delay """
+        with self._condition:
+            self._deadline = time.monotonic()
+            self._condition.notify()
+
+    def close(self) -> None:
+        """ Delivers the remaining messages and stops the delivery thread """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self._thread = None
+        self._closed = False
+
+    def _deliver(self):
+        while True:
+            with self._condition:
+                while len(self._batch) < self._maxSize and not self._closed:
+                    timeout = None if not self._batch else self._deadline - time.monotonic()
+                    if timeout is not None and timeout <= 0:
+                        break
+                    self._condition.wait(timeout)
+                if not self._batch and self._closed:
+                    return
+                batch = self._batch
+                self._batch = []
+            for i in range(0, len(batch), self._maxSize):
+                try:
+                    self._callback(batch[i:i + self._maxSize])
+                except Exception as e:
+                    reportError(self._onError, e)
+
+
+class BoundedQueue:
+    """
+    Thread-safe FIFO queue with the interface of queue.Queue, and a policy for when it is full:
+    BLOCK makes put wait for room, DROP_OLDEST discards the oldest item to make room,
+    KEEP_LATEST keeps only the newest item for each key(item): a new item replaces the queued item with the same key
+    in place, and the oldest item is discarded if the queue is full of other keys.
+    Discarded items are counted in dropped.
+    """
+
+    def __init__(self, maxsize: int = 0, policy: str = BLOCK, key=None):
+        if policy not in (BLOCK, DROP_OLDEST, KEEP_LATEST):
+            raise ValueError('Unknown policy: {}'.format(policy))
+        if policy == KEEP_LATEST and key is None:
+            raise ValueError('KEEP_LATEST needs a key function')
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self._key = key
+        self._items = OrderedDict() if policy == KEEP_LATEST else deque()
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def empty(self) -> bool:
+        return not self._items
+
+    def full(self) -> bool:
+        return 0 < self.maxsize <= len(self._items)
+
+    def put(self, item, block: bool = True, timeout: float = None) -> None:
+        with self._condition:
+            if self.policy == KEEP_LATEST:
+                key = self._key(item)
+                if key in self._items:
+                    self._items[key] = item
+                    self.dropped += 1
+                    return
+            if self.full():
+                if self.policy == BLOCK:
+                    if not block or not self._condition.wait_for(lambda: not self.full(), timeout):
+                        raise Full
+                else:
+                    self._discardOldest()
+            if self.policy == KEEP_LATEST:
+                self._items[key] = item
+            else:
+                self._items.append(item)
+            self._condition.notify_all()
+
+    def put_nowait(self, item) -> None:
+        self.put(item, block=False)
+
+    def get(self, block: bool = True, timeout: float = None):
+        """ Raises Empty when there is nothing to get in time, or right away once closed and drained """
+        with self._condition:
+            if not self._items:
+                if not block or not self._condition.wait_for(lambda: self._items or self._closed, timeout):
+                    raise Empty
+                if not self._items:
+                    raise Empty
+            if self.policy == KEEP_LATEST:
+                item = self._items.popitem(last=False)[1]
+            else:
+                item = self._items.popleft()
+            self._condition.notify_all()
+            return item
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def close(self) -> None:
+        """ Wakes up consumers waiting on an empty queue """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def reopen(self) -> None:
+        with self._condition:
+            self._closed = False
+
+    def _discardOldest(self) -> None:
+        if self.policy == KEEP_LATEST:
+            self._items.popitem(last=False)
+        else:
+            self._items.popleft()
+        self.dropped += 1
+
+
+class QueuedCallback:
+    """
+    Decouples a callback from the thread calling it: calls are queued in a BoundedQueue and the callback is run
+    on a thread of its own, so a slow consumer can not stall the caller beyond what the queue policy allows.
+    Exceptions raised by the callback are passed to onError (printed if it is None) and delivery goes on.
+    """
+
+    def __init__(self, callback, maxsize: int = 0, policy: str = BLOCK, key=None, onError=None):
+        self._callback = callback
+        self._onError = onError
+        self.queue = BoundedQueue(maxsize, policy, key)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def __call__(self, msg):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._deliver, daemon=True)
+                    self._thread.start()
+        self.queue.put(msg)
+
+    @property
+    def dropped(self) -> int:
+        return self.queue.dropped
+
+    def close(self) -> None:
+        """ Delivers the queued messages and stops the delivery thread """
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self.queue.close()
+            thread.join()
+            self.queue.reopen()
+
+    def _deliver(self):
+        while True:
+            try:
+                msg = self.queue.get()
+            except Empty:
+                return
+            try:
+                self._callback(msg)
+            except Exception as e:
+                reportError(self._onError, e)
@@ -1,9 +1,12 @@
+import os
 import time
 from abc import abstractmethod
+from collections import deque
 from queue import Empty
 from threading import Lock
 
-from libAnt.constants import MESSAGE_TX_SYNC
+from libAnt import metrics
+from libAnt.constants import MESSAGE_TX_SYNC, MESSAGE_MAX_LENGTH
 from libAnt.loggers.logger import Logger
 from libAnt.message import Message
 
@@ -12,6 +15,107 @@ class DriverException(Exception):
     pass
 
 
+class Wakeup:
+    """
+    Selectable flag for drivers whose data is queued by a background thread.
+    The thread sets it after queueing data, so selectors and event loops can wait on fileno().
+    """
+
+    def __init__(self):
+        self._r, self._w = os.pipe()
+        os.set_blocking(self._r, False)
+        os.set_blocking(self._w, False)
+
+    def __del__(self):
+        self.close()
+
+    def fileno(self) -> int:
+        return self._r
+
+    def set(self) -> None:
+        try:
+            os.write(self._w, b'\x00')
+        except BlockingIOError:
+            pass  # Already set
+
+    def clear(self) -> None:
+        try:
+            while os.read(self._r, 512):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self) -> None:
+        if self._r is not None:
+            os.close(self._r)
+            os.close(self._w)
+            self._r = self._w = None
+
+
+class FrameDecoder:
+    """
+    Streaming decoder which turns arbitrary chunks of raw bytes into ANT messages.
+    Incomplete frames are kept in an internal buffer until the rest of the bytes arrive,
+    bytes which are not part of a frame are skipped until the next sync byte is found.
+    """
+
+    def __init__(self, onFrame=None):
+        self._buffer = bytearray()
+        self._onFrame = onFrame
+        self.resyncs = 0
+        self.checksumErrors = 0
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def reset(self) -> None:
+        self._buffer.clear()
+
+    def decode(self, data: bytes) -> list:
+        """
+        :param data: Raw bytes read from the device
+        :return: Every complete, checksum-valid message found in the buffer
+        """
+        buf = self._buffer
+        buf += data
+        end = len(buf)
+        messages = []
+        pos = 0
+        while True:
+            start = buf.find(MESSAGE_TX_SYNC, pos)
+            if start < 0:
+                pos = end
+                break
+            if start != pos:
+                self.resyncs += 1
+            if end - start < 4:  # sync, length, type and checksum are always present
+                pos = start
+                break
+            length = buf[start + 1]
+            if length > MESSAGE_MAX_LENGTH:
+                pos = start + 1
+                continue
+            frameEnd = start + length + 4
+            if frameEnd > end:
+                pos = start
+                break
+            frame = bytes(buf[start:frameEnd])
+            if self._onFrame is not None:
+                self._onFrame(frame)
+            chk = 0
+            for b in frame:
+                chk ^= b
+            if chk == 0:
+                messages.append(Message(frame[2], frame[3:-1]))
+                pos = frameEnd
+            else:
+                # The sync byte was probably garbage, look for the next one inside this frame
+                self.checksumErrors += 1
+                pos = start + 1
+        del buf[:pos]
+        return messages
+
+
 class Driver:
     """
     The driver provides an interface to read and write raw data to and from an ANT+ capable hardware device
@@ -21,6 +125,8 @@ class Driver:
         self._lock = Lock()
         self._logger = logger
         self._openTime = None
+        self._decoder = FrameDecoder(onFrame=self._logFrame)
+        self._pending = deque()
 
     def __enter__(self):
         self.open()
@@ -37,6 +143,8 @@ class Driver:
         with self._lock:
             if not self._isOpen():
                 self._openTime = time.time()
+                self._decoder.reset()
+                self._pending.clear()
                 if self._logger is not None:
                     self._logger.open()
                 self._open()
@@ -52,6 +160,8 @@ class Driver:
         with self._lock:
             if self._isOpen():
                 self._close()
+            self._decoder.reset()
+            self._pending.clear()
             self._open()
 
     def read(self, timeout=None) -> Message:
@@ -59,28 +169,47 @@ class Driver:
             raise DriverException("Device is closed")
 
         with self._lock:
-            while True:
-                try:
-                    sync = self._read(1, timeout=timeout)[0]
-                    if sync is not MESSAGE_TX_SYNC:
-                        continue
-                    length = self._read(1, timeout=timeout)[0]
-                    type = self._read(1, timeout=timeout)[0]
-                    data = self._read(length, timeout=timeout)
-                    chk = self._read(1, timeout=timeout)[0]
-                    msg = Message(type, data)
-
-                    if self._logger:
-                        logMsg = bytearray([sync, length, type])
-                        logMsg.extend(data)
-                        logMsg.append(chk)
-
-                        self._logger.log(bytes(logMsg))
-
-                    if msg.checksum() == chk:
-                        return msg
-                except IndexError:
-                    raise Empty
+            while not self._pending:
+                self._pending.extend(self._decode(timeout))
+            return self._pending.popleft()
+
+    def readAll(self, timeout=None) -> list:
+        """
+        Reads whatever the device has available and decodes it in one go.
+        Use timeout=0 when fileno() has signalled that data is ready.
+        :return: Every complete message read, possibly none if only part of a message has arrived
+        """
+        if not self.isOpen():
+            raise DriverException("Device is closed")
+
+        with self._lock:
+            if self._pending:
+                messages = list(self._pending)
+                self._pending.clear()
+                return messages
+            return self._decode(timeout)
+
+    def _decode(self, timeout=None) -> list:
+        data = self._readAvailable(timeout=timeout)
+        if not data:
+            raise Empty
+        if not metrics.enabled:
+            return self._decoder.decode(data)
+
+        decoder = self._decoder
+        resyncs, checksumErrors = decoder.resyncs, decoder.checksumErrors
+        start = time.perf_counter()
+        messages = decoder.decode(data)
+        metrics.decodeSeconds.observe(time.perf_counter() - start)
+        metrics.bytesRead.inc(len(data))
+        metrics.frames.inc(len(messages))
+        metrics.resyncs.inc(decoder.resyncs - resyncs)
+        metrics.checksumErrors.inc(decoder.checksumErrors - checksumErrors)
+        return messages
+
+    def _logFrame(self, frame: bytes) -> None:
+        if self._logger:
+            self._logger.log(frame)
 
     def write(self, msg: Message) -> None:
         if not self.isOpen():
@@ -92,6 +221,26 @@ class Driver:
     def abort(self) -> None:
         self._abort()
 
+    def fileno(self):
+        """
+        :return: File descriptor which becomes readable when there is data to read, or None if not supported
+        """
+        return None
+
+    @property
+    def dropped(self) -> int:
+        """
+        :return: Number of chunks of data discarded because the driver's buffer was full
+        """
+        return 0
+
+    @property
+    def bufferDepth(self) -> int:
+        """
+        :return: Number of chunks of data read from the device and waiting in the driver's buffer
+        """
+        return 0
+
     @abstractmethod
     def _isOpen(self) -> bool:
         pass
@@ -108,6 +257,13 @@ class Driver:
     def _read(self, count: int, timeout=None) -> bytes:
         pass
 
+    def _readAvailable(self, timeout=None) -> bytes:
+        """
+        Wait for at least one byte, then return everything which can be read without blocking.
+        Drivers which can tell how many bytes are waiting should override this.
+        """
+        return self._read(1, timeout=timeout)
+
     @abstractmethod
     def _write(self, data: bytes) -> None:
         pass
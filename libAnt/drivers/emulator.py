@@ -0,0 +1,303 @@
+import time
+from queue import Empty, Full
+from threading import Thread, Event, Lock
+
+from libAnt.constants import *
+from libAnt.core import BoundedQueue, BLOCK
+from libAnt.drivers.driver import Driver, FrameDecoder, Wakeup
+from libAnt.loggers.logger import Logger
+from libAnt.message import Message
+
+
+class VirtualDevice:
+    """
+    A sensor which sends one data page for every call of payload(), with its counters advancing like a real device's.
+    Power meters (11) send power-only pages, speed & cadence sensors (121) and heart rate monitors (120) their
+    only page, other device types a page of zeros with an event count.
+    """
+
+    def __init__(self, deviceNumber: int, deviceType: int, transType: int = 1, rssi: int = -60):
+        self.deviceNumber = deviceNumber
+        self.deviceType = deviceType
+        self.transType = transType
+        self.rssi = rssi
+        self._events = 0
+
+    def payload(self) -> bytes:
+        step = self._events
+        self._events += 1
+        if self.deviceType == 11:
+            power = 150 + step % 100
+            accumulated = step * 200 & 0xFFFF
+            return bytes([0x10, step & 0xFF, 0xFF, 90, accumulated & 0xFF, accumulated >> 8,
+                          power & 0xFF, power >> 8])
+        if self.deviceType == 121:
+            eventTime = step * 1024 & 0xFFFF
+            return bytes([eventTime & 0xFF, eventTime >> 8, step & 0xFF, step >> 8 & 0xFF,
+                          eventTime & 0xFF, eventTime >> 8, step * 2 & 0xFF, step * 2 >> 8 & 0xFF])
+        if self.deviceType == 120:
+            beatTime = step * 820 & 0xFFFF
+            return bytes([0, 0, 0, 0, beatTime & 0xFF, beatTime >> 8, step & 0xFF, 60 + step % 100])
+        return bytes([0, 0, 0, 0, 0, 0, 0, step & 0xFF])
+
+
+class EmulatedDriver(Driver):
+    """
+    An ANT stick emulated in-process, for testing without hardware.
+    It answers configuration messages with channel events the way a stick does, and once a channel is open (or rx
+    scan mode is on) it receives broadcasts from its virtual devices, round robin, at rate messages per second in
+    total. The extended fields of the broadcasts follow the lib config sent to it.
+    :param devices: Number of virtual devices (power meters, speed & cadence sensors and heart rate monitors in turn),
+                    or a list of VirtualDevices
+    :param rate: Broadcasts per second, over all devices. Real devices send about 4 each.
+    :param maxChannels: Number of channels reported in the capabilities
+    """
+
+    def __init__(self, devices=8, rate: float = None, logger: Logger = None, maxChannels: int = 8,
+                 bufferSize: int = 4096, bufferPolicy: str = BLOCK):
+        super().__init__(logger=logger)
+        if isinstance(devices, int):
+            devices = [VirtualDevice(10000 + i, (11, 121, 120)[i % 3], rssi=-50 - i % 40) for i in range(devices)]
+        self._devices = devices
+        self._rate = rate if rate is not None else 4.0 * len(devices)
+        self._maxChannels = maxChannels
+        self._bufferSize = bufferSize
+        self._bufferPolicy = bufferPolicy
+        self._isopen = False
+        self._buffer = None
+        self._rx = bytearray()
+        self._wakeup = None  # Created when the driver is opened, closed with it
+        self._commands = FrameDecoder()
+        self._stateLock = Lock()
+        self._channels = {}  # Channel number -> [open, device number, device type]
+        self._scanning = False
+        self._extendedFlags = 0
+        self._loop = None
+        self.sent = 0  # Broadcasts sent since the driver was opened
+
+    def __str__(self):
+        return 'Emulated stick ({} devices @ {:g} msg/s)'.format(len(self._devices), self._rate)
+
+    class EmulatorLoop(Thread):
+        def __init__(self, driver, rate: float):
+            super().__init__(daemon=True)
+            self._stopper = Event()
+            self._driver = driver
+            self._rate = rate
+
+        def stop(self) -> None:
+            self._stopper.set()
+
+        def run(self) -> None:
+            start = time.monotonic()
+            sent = 0
+            interval = max(1 / self._rate, 0.001)
+            while not self._stopper.is_set():
+                due = int((time.monotonic() - start) * self._rate)
+                if due - sent > self._rate:
+                    sent = due - int(self._rate)  # Don't flood the reader with more than a second of backlog
+                if due > sent:
+                    self._put(self._driver._broadcast(due - sent))
+                    sent = due
+                self._stopper.wait(interval)
+
+        def _put(self, data: bytes) -> None:
+            buffer = self._driver._buffer
+            while data and not self._stopper.is_set():
+                try:
+                    buffer.put(data, timeout=0.1)
+                    self._driver._wakeup.set()
+                    return
+                except Full:
+                    pass
+
+    def _isOpen(self) -> bool:
+        return self._isopen
+
+    def _open(self) -> None:
+        self._isopen = True
+        self._buffer = BoundedQueue(self._bufferSize, self._bufferPolicy)
+        self._rx.clear()
+        self._wakeup = Wakeup()
+        self._commands.reset()
+        self._reset()
+        self.sent = 0
+        self._loop = self.EmulatorLoop(self, self._rate)
+        self._loop.start()
+
+    def _close(self) -> None:
+        self._isopen = False
+        if self._loop is not None:
+            self._loop.stop()
+            self._loop.join()
+        self._loop = None
+        if self._wakeup is not None:
+            self._wakeup.close()
+            self._wakeup = None
+
+    def _read(self, count: int, timeout=None) -> bytes:
+        while len(self._rx) < count:
+            self._rx += self._buffer.get(block=True, timeout=timeout)
+        data = bytes(self._rx[:count])
+        del self._rx[:count]
+        return data
+
+    def _readAvailable(self, timeout=None) -> bytes:
+        self._wakeup.clear()
+        if not self._rx:
+            self._rx += self._buffer.get(block=True, timeout=timeout)
+        try:
+            for i in range(self._buffer.qsize()):
+                self._rx += self._buffer.get(block=False)
+        except Empty:
+            pass
+        data = bytes(self._rx)
+        self._rx.clear()
+        return data
+
+    def fileno(self):
+        return self._wakeup.fileno() if self._wakeup is not None else None
+
+    @property
+    def dropped(self) -> int:
+        return self._buffer.dropped if self._buffer is not None else 0
+
+    @property
+    def bufferDepth(self) -> int:
+        return self._buffer.qsize() if self._buffer is not None else 0
+
+    def _write(self, data: bytes) -> None:
+        # Reads and writes are serialized by the driver lock, so responses can go straight to the read buffer.
+        # Queueing them behind the broadcasts could deadlock a reader which is waiting for its write to finish.
+        for msg in self._commands.decode(data):
+            for response in self._respond(msg):
+                self._rx += response.encode()
+        self._wakeup.set()
+
+    def _abort(self) -> None:
+        pass
+
+    def _reset(self) -> None:
+        with self._stateLock:
+            self._channels = {}
+            self._scanning = False
+            self._extendedFlags = 0
+
+    def _event(self, channel: int, msgId: int, code: int = RESPONSE_NO_ERROR) -> Message:
+        return Message(MESSAGE_CHANNEL_EVENT, bytes([channel, msgId, code]))
+
+    def _respond(self, msg: Message) -> list:
+        """
+        :return: The messages the stick answers msg with
+        """
+        type, content = msg.type, msg.content
+        if type == MESSAGE_SYSTEM_RESET:
+            self._reset()
+            return [Message(MESSAGE_STARTUP, bytes([0x20]))]  # Command reset
+        if type == MESSAGE_CHANNEL_REQUEST:
+            return self._request(content[0], content[1])
+        if not content:
+            return [self._event(0, type, INVALID_MESSAGE)]
+
+        channel = content[0]
+        with self._stateLock:
+            state = self._channels.get(channel)
+            if type in (MESSAGE_NETWORK_KEY, MESSAGE_ENABLE_EXT_RX_MESSAGES, MESSAGE_LIB_CONFIG, MESSAGE_TX_POWER):
+                if type == MESSAGE_LIB_CONFIG:
+                    self._extendedFlags = content[1] & (EXT_FLAG_CHANNEL_ID | EXT_FLAG_RSSI | EXT_FLAG_TIMESTAMP)
+                elif type == MESSAGE_ENABLE_EXT_RX_MESSAGES and content[1]:
+                    self._extendedFlags |= EXT_FLAG_CHANNEL_ID
+                return [self._event(channel, type)]
+            if channel >= self._maxChannels:
+                return [self._event(channel, type, INVALID_PARAMETER_PROVIDED)]
+            if type == MESSAGE_CHANNEL_ASSIGN:
+                if state is not None:
+                    return [self._event(channel, type, CHANNEL_IN_WRONG_STATE)]
+                self._channels[channel] = [False, 0, 0]
+                return [self._event(channel, type)]
+            if state is None:
+                return [self._event(channel, type, CHANNEL_IN_WRONG_STATE)]
+            if type == MESSAGE_CHANNEL_UNASSIGN:
+                if state[0]:
+                    return [self._event(channel, type, CHANNEL_IN_WRONG_STATE)]
+                del self._channels[channel]
+            elif type == MESSAGE_CHANNEL_ID:
+                state[1] = content[1] | (content[2] << 8)
+                state[2] = content[3]
+            elif type in (MESSAGE_CHANNEL_OPEN, OPEN_RX_SCAN_MODE):
+                if state[0]:
+                    return [self._event(channel, type, CHANNEL_IN_WRONG_STATE)]
+                state[0] = True
+                self._scanning = type == OPEN_RX_SCAN_MODE
+            elif type == MESSAGE_CHANNEL_CLOSE:
+                if not state[0]:
+                    return [self._event(channel, type, CHANNEL_IN_WRONG_STATE)]
+                state[0] = False
+                if channel == 0:
+                    self._scanning = False
+                return [self._event(channel, type), self._event(channel, 1, EVENT_CHANNEL_CLOSED)]
+            elif type == MESSAGE_CHANNEL_BROADCAST_DATA:
+                return []  # Nothing to answer, and nobody listens to us
+            elif type not in (MESSAGE_CHANNEL_PERIOD, MESSAGE_CHANNEL_SEARCH_TIMEOUT, MESSAGE_CHANNEL_FREQUENCY,
+                              MESSAGE_LOW_PRIORITY_SEARCH_TIMEOUT, MESSAGE_SEARCH_WAVEFORM, MESSAGE_CHANNEL_TX_POWER,
+                              MESSAGE_PROXIMITY_SEARCH, MESSAGE_CONFIG_ID_LIST, MESSAGE_ADD_CHANNEL_ID_TO_LIST):
+                return [self._event(channel, type, INVALID_MESSAGE)]
+            return [self._event(channel, type)]
+
+    def _request(self, channel: int, msgId: int) -> list:
+        if msgId == MESSAGE_CAPABILITIES:
+            advanced = CAPABILITIES_NETWORK_ENABLED | CAPABILITIES_SERIAL_NUMBER_ENABLED | \
+                       CAPABILITIES_SEARCH_LIST_ENABLED
+            advanced2 = CAPABILITIES_EXT_MESSAGE_ENABLED | CAPABILITIES_SCAN_MODE_ENABLED | \
+                        CAPABILITIES_EXT_ASSIGN_ENABLED
+            return [Message(MESSAGE_CAPABILITIES, bytes([self._maxChannels, 8, 0, advanced, advanced2, 0]))]
+        if msgId == MESSAGE_CHANNEL_STATUS:
+            with self._stateLock:
+                state = self._channels.get(channel)
+            if state is None:
+                status = CHANNEL_STATE_UNASSIGNED
+            else:
+                status = CHANNEL_STATE_TRACKING if state[0] else CHANNEL_STATE_ASSIGNED
+            return [Message(MESSAGE_CHANNEL_STATUS, bytes([channel, status]))]
+        if msgId == MESSAGE_VERSION:
+            return [Message(MESSAGE_VERSION, b'EMULATED\x00')]
+        if msgId == MESSAGE_SERIAL_NUMBER:
+            return [Message(MESSAGE_SERIAL_NUMBER, b'\x01\x00\xAD\xDE')]
+        return [self._event(channel, MESSAGE_CHANNEL_REQUEST, INVALID_MESSAGE)]
+
+    def _broadcast(self, count: int) -> bytes:
+        """
+        :return: Frames of the next count broadcasts, for every channel which receives them
+        """
+        with self._stateLock:
+            receivers = [(channel, state[1], state[2]) for channel, state in self._channels.items() if state[0]]
+            if self._scanning:
+                receivers = [(0, 0, 0)]
+            flags = self._extendedFlags
+        if not receivers:
+            return b''
+        devices = self._devices
+        timestamp = int(time.monotonic() * 32768)
+        frames = []
+        for i in range(count):
+            device = devices[(self.sent + i) % len(devices)]
+            payload = device.payload()
+            for channel, deviceNumber, deviceType in receivers:
+                if deviceNumber and deviceNumber != device.deviceNumber:
+                    continue
+                if deviceType and deviceType != device.deviceType:
+                    continue
+                content = bytearray([channel])
+                content += payload
+                if flags:
+                    content.append(flags)
+                    if flags & EXT_FLAG_CHANNEL_ID:
+                        content += bytes([device.deviceNumber & 0xFF, device.deviceNumber >> 8, device.deviceType,
+                                          device.transType])
+                    if flags & EXT_FLAG_RSSI:
+                        content += bytes([0x20, device.rssi & 0xFF, 0xB0])  # Measurement type, RSSI, threshold
+                    if flags & EXT_FLAG_TIMESTAMP:
+                        content += bytes([timestamp & 0xFF, timestamp >> 8 & 0xFF])
+                frames.append(Message(MESSAGE_CHANNEL_BROADCAST_DATA, bytes(content)).encode())
+        self.sent += count
+        return b''.join(frames)
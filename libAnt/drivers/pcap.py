@@ -1,69 +1,182 @@
+import mmap
 import time
-from queue import Queue
-from struct import unpack, error
+from queue import Empty, Full
+from struct import Struct
 from threading import Thread, Event
 
-from libAnt.drivers.driver import Driver
+from libAnt.core import BoundedQueue, BLOCK
+from libAnt.drivers.driver import Driver, DriverException, Wakeup
 from libAnt.loggers.logger import Logger
 
 
+class PcapReader:
+    """
+    Reads the packets of a pcap capture, either from a file (which is memory mapped) or from a bytes buffer
+    """
+
+    globalHeaderLength = 24
+    magicNumbers = {
+        b'\xD4\xC3\xB2\xA1': ('<', 1000000),
+        b'\xA1\xB2\xC3\xD4': ('>', 1000000),
+        b'\x4D\x3C\xB2\xA1': ('<', 1000000000),
+        b'\xA1\xB2\x3C\x4D': ('>', 1000000000),
+    }
+
+    def __init__(self, source):
+        self._source = source
+        self._file = None
+        self._data = None
+        self._packetHeader = None
+        self._tsDivisor = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __iter__(self):
+        if self._data is None:
+            self.open()
+        data = self._data
+        unpack_from = self._packetHeader.unpack_from
+        headerLength = self._packetHeader.size
+        divisor = self._tsDivisor
+        offset = self.globalHeaderLength
+        end = len(data) - headerLength
+        while offset <= end:
+            ts_sec, ts_frac, incl_len, orig_len = unpack_from(data, offset)
+            offset += headerLength
+            if offset + incl_len > len(data):
+                return  # Truncated record, the capture was cut off while it was written
+            yield ts_sec + ts_frac / divisor, bytes(data[offset:offset + incl_len])
+            offset += incl_len
+
+    def packets(self, offset: int = None):
+        """
+        :param offset: File offset of the packet to start from, the first packet if omitted
+        :return: Generator of (file offset, timestamp, data) tuples of the packets
+        """
+        if self._data is None:
+            self.open()
+        data = self._data
+        unpack_from = self._packetHeader.unpack_from
+        headerLength = self._packetHeader.size
+        divisor = self._tsDivisor
+        if offset is None:
+            offset = self.globalHeaderLength
+        end = len(data) - headerLength
+        while offset <= end:
+            ts_sec, ts_frac, incl_len, orig_len = unpack_from(data, offset)
+            start = offset + headerLength
+            if start + incl_len > len(data):
+                return  # Truncated record
+            yield offset, ts_sec + ts_frac / divisor, bytes(data[start:start + incl_len])
+            offset = start + incl_len
+
+    def open(self) -> None:
+        if self._data is not None:
+            return
+        if isinstance(self._source, str):
+            self._file = open(self._source, 'rb')
+            try:
+                self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # Empty files can not be mapped
+                self._data = b''
+        else:
+            self._data = memoryview(self._source)
+
+        magic = bytes(self._data[:4])
+        if magic not in self.magicNumbers:
+            self.close()
+            raise DriverException("Not a pcap capture")
+        byteOrder, self._tsDivisor = self.magicNumbers[magic]
+        self._packetHeader = Struct(byteOrder + 'IIII')
+
+    def close(self) -> None:
+        if isinstance(self._data, memoryview):
+            self._data.release()
+        elif isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
 class PcapDriver(Driver):
-    def __init__(self, pcap : str, logger: Logger = None):
+    """
+    Replays a pcap capture as if it was coming from a device.
+    :param speed: Replay speed relative to the capture (1.0 is real-time), None or 0 replays as fast as possible
+    :param bufferSize: Number of packets read ahead of the consumer, 0 means unlimited
+    :param bufferPolicy: What happens when the buffer is full, see BoundedQueue. Blocking pauses the replay.
+    """
+
+    def __init__(self, pcap: str, logger: Logger = None, speed: float = 1.0, bufferSize: int = 1024,
+                 bufferPolicy: str = BLOCK):
         super().__init__(logger=logger)
         self._isopen = False
         self._pcap = pcap
-        self._buffer = Queue()
+        self._speed = speed
+        self._bufferSize = bufferSize
+        self._bufferPolicy = bufferPolicy
+        self._buffer = None
+        self._rx = bytearray()
+        self._wakeup = None  # Created when the driver is opened, closed with it
 
         self._loop = None
 
     class PcapLoop(Thread):
-        def __init__(self, pcap, buffer: Queue):
+        def __init__(self, pcap, buffer: BoundedQueue, speed: float = 1.0, wakeup: Wakeup = None):
             super().__init__()
             self._stopper = Event()
             self._pcap = pcap
             self._buffer = buffer
+            self._speed = speed
+            self._wakeup = wakeup
 
         def stop(self) -> None:
             self._stopper.set()
 
         def run(self) -> None:
-            self._pcapfile = open(self._pcap, 'rb')
-            # move file pointer to first packet header
-            global_header_length = 24
-            self._pcapfile.seek(global_header_length, 0)
-
-            first_ts = 0
-            start_time = time.time()
+            try:
+                with PcapReader(self._pcap) as reader:
+                    first_ts = None
+                    start_time = time.time()
+                    for ts, data in reader:
+                        if self._stopper.is_set():
+                            break
+                        if self._speed:
+                            if first_ts is None:
+                                first_ts = ts
+                            send_time = (ts - first_ts) / self._speed
+                            elapsed_time = time.time() - start_time
+                            if send_time > elapsed_time:
+                                self._stopper.wait(send_time - elapsed_time)
+                        self._put(data)
+            except Exception as e:
+                self._put(e)  # The reader raises it
+
+        def _put(self, data: bytes) -> None:
             while not self._stopper.is_set():
                 try:
-                    ts_sec, = unpack('i', self._pcapfile.read(4))
-                except error:
-                    break
-                ts_usec = unpack('i', self._pcapfile.read(4))[0] / 1000000
-
-                if first_ts is 0:
-                    first_ts = ts_sec + ts_usec
-
-                ts = ts_sec + ts_usec
-                send_time = ts - first_ts
-                elapsed_time = time.time() - start_time
-                if send_time > (elapsed_time):
-                    sleep_time = send_time - elapsed_time
-                    time.sleep(sleep_time)
-
-                packet_length = unpack('i', self._pcapfile.read(4))[0]
-                self._pcapfile.seek(4, 1)
-                for i in range(packet_length):
-                    self._buffer.put(self._pcapfile.read(1))
-
-            self._pcapfile.close()
+                    self._buffer.put(data, timeout=0.1)
+                    if self._wakeup is not None:
+                        self._wakeup.set()
+                    return
+                except Full:
+                    pass
 
     def _isOpen(self) -> bool:
         return self._isopen
 
     def _open(self) -> None:
         self._isopen = True
-        self._loop = self.PcapLoop(self._pcap, self._buffer)
+        self._buffer = BoundedQueue(self._bufferSize, self._bufferPolicy)
+        self._rx.clear()
+        self._wakeup = Wakeup()
+        self._loop = self.PcapLoop(self._pcap, self._buffer, self._speed, self._wakeup)
         self._loop.start()
 
     def _close(self) -> None:
@@ -73,14 +186,52 @@ class PcapDriver(Driver):
                 self._loop.stop()
                 self._loop.join()
         self._loop = None
+        if self._wakeup is not None:
+            self._wakeup.close()
+            self._wakeup = None
 
-    def _read(self, count: int, timeout=None) -> bytes:
-        result = bytearray()
-
-        while len(result) < count:
-            result += self._buffer.get(block=True, timeout=timeout)
+    def _get(self, block: bool = True, timeout=None) -> bytes:
+        data = self._buffer.get(block=block, timeout=timeout)
+        if isinstance(data, Exception):
+            self._buffer.put(data)  # Every later read fails the same way
+            raise data
+        return data
 
-        return bytes(result)
+    def _read(self, count: int, timeout=None) -> bytes:
+        while len(self._rx) < count:
+            self._rx += self._get(timeout=timeout)
+        data = bytes(self._rx[:count])
+        del self._rx[:count]
+        return data
+
+    def _readAvailable(self, timeout=None) -> bytes:
+        self._wakeup.clear()
+        if not self._rx:
+            self._rx += self._get(timeout=timeout)
+        try:
+            for i in range(self._buffer.qsize()):
+                data = self._buffer.get(block=False)
+                if isinstance(data, Exception):
+                    self._buffer.put(data)  # Raised by the next read, after handing out the data before it
+                    self._wakeup.set()
+                    break
+                self._rx += data
+        except Empty:
+            pass
+        data = bytes(self._rx)
+        self._rx.clear()
+        return data
+
+    def fileno(self):
+        return self._wakeup.fileno() if self._wakeup is not None else None
+
+    @property
+    def dropped(self) -> int:
+        return self._buffer.dropped if self._buffer is not None else 0
+
+    @property
+    def bufferDepth(self) -> int:
+        return self._buffer.qsize() if self._buffer is not None else 0
 
     def _write(self, data: bytes) -> None:
         pass
@@ -43,6 +43,17 @@ class SerialDriver(Driver):
     def _read(self, count: int, timeout=None) -> bytes:
         return self._serial.read(count)
 
+    def _readAvailable(self, timeout=None) -> bytes:
+        if self._serial.timeout != timeout:
+            self._serial.timeout = timeout
+        return self._serial.read(max(1, self._serial.in_waiting))
+
+    def fileno(self):
+        try:
+            return self._serial.fileno()
+        except AttributeError:  # Not available on windows
+            return None
+
     def _write(self, data: bytes) -> None:
         try:
             self._serial.write(data)
@@ -1,4 +1,4 @@
-from queue import Queue
+from queue import Empty
 from threading import Event, Thread
 
 from usb import USBError, ENDPOINT_OUT, ENDPOINT_IN
@@ -6,16 +6,19 @@ from usb.control import get_interface
 from usb.core import find
 from usb.util import find_descriptor, endpoint_direction, claim_interface, dispose_resources
 
-from libAnt.drivers.driver import Driver, DriverException
+from libAnt.core import BoundedQueue, DROP_OLDEST
+from libAnt.drivers.driver import Driver, DriverException, Wakeup
 from libAnt.loggers.logger import Logger
 
 
 class USBDriver(Driver):
     """
     An implementation of a USB ANT+ device driver
+    :param bufferSize: Number of USB packets buffered for the reader, 0 means unlimited
+    :param bufferPolicy: What happens when the buffer is full, see BoundedQueue. Blocking stops reading the device.
     """
 
-    def __init__(self, vid, pid, logger: Logger = None):
+    def __init__(self, vid, pid, logger: Logger = None, bufferSize: int = 4096, bufferPolicy: str = DROP_OLDEST):
         super().__init__(logger=logger)
         self._idVendor = vid
         self._idProduct = pid
@@ -24,7 +27,11 @@ class USBDriver(Driver):
         self._epIn = None
         self._interfaceNumber = None
         self._packetSize = 0x20
+        self._bufferSize = bufferSize
+        self._bufferPolicy = bufferPolicy
         self._queue = None
+        self._rx = bytearray()
+        self._wakeup = None  # Created when the driver is opened, closed with it
         self._loop = None
         self._driver_open = False
 
@@ -34,12 +41,13 @@ class USBDriver(Driver):
         return "Closed"
 
     class USBLoop(Thread):
-        def __init__(self, ep, packetSize: int, queue: Queue):
+        def __init__(self, ep, packetSize: int, queue: BoundedQueue, wakeup: Wakeup = None):
             super().__init__()
             self._stopper = Event()
             self._ep = ep
             self._packetSize = packetSize
             self._queue = queue
+            self._wakeup = wakeup
 
         def stop(self) -> None:
             self._stopper.set()
@@ -48,13 +56,17 @@ class USBDriver(Driver):
             while not self._stopper.is_set():
                 try:
                     data = self._ep.read(self._packetSize, timeout=1000)
-                    for d in data:
-                        self._queue.put(d)
+                    if data:
+                        self._queue.put(data.tobytes())
+                        if self._wakeup is not None:
+                            self._wakeup.set()
                 except USBError as e:
                     if e.errno not in (60, 110) and e.backend_error_code != -116:  # Timout errors
                         self._stopper.set()
-            # We Put in an invalid byte so threads will realize the device is stopped
+            # We Put in an invalid packet so threads will realize the device is stopped
             self._queue.put(None)
+            if self._wakeup is not None:
+                self._wakeup.set()
 
     def _isOpen(self) -> bool:
         return self._driver_open
@@ -99,8 +111,10 @@ class USBDriver(Driver):
             if self._epOut is None or self._epIn is None:
                 raise DriverException("Could not initialize USB endpoint")
 
-            self._queue = Queue()
-            self._loop = self.USBLoop(self._epIn, self._packetSize, self._queue)
+            self._queue = BoundedQueue(self._bufferSize, self._bufferPolicy)
+            self._rx.clear()
+            self._wakeup = Wakeup()
+            self._loop = self.USBLoop(self._epIn, self._packetSize, self._queue, self._wakeup)
             self._loop.start()
             self._driver_open = True
             print('USB OPEN SUCCESS')
@@ -115,6 +129,9 @@ class USBDriver(Driver):
                 self._loop.stop()
                 self._loop.join()
         self._loop = None
+        if self._wakeup is not None:
+            self._wakeup.close()
+            self._wakeup = None
         try:
             self._dev.reset()
             dispose_resources(self._dev)
@@ -124,15 +141,49 @@ class USBDriver(Driver):
         self._driver_open = False
         print('USB CLOSE END')
 
+    def _fill(self, timeout=None) -> None:
+        packet = self._queue.get(timeout=timeout)
+        if packet is None:
+            self._close()
+            raise DriverException("Device is closed!")
+        self._rx += packet
+
     def _read(self, count: int, timeout=None) -> bytes:
-        data = bytearray()
-        for i in range(0, count):
-            b = self._queue.get(timeout=timeout)
-            if b is None:
-                self._close()
-                raise DriverException("Device is closed!")
-            data.append(b)
-        return bytes(data)
+        while len(self._rx) < count:
+            self._fill(timeout=timeout)
+        data = bytes(self._rx[:count])
+        del self._rx[:count]
+        return data
+
+    def _readAvailable(self, timeout=None) -> bytes:
+        self._wakeup.clear()
+        if not self._rx:
+            self._fill(timeout=timeout)
+        try:
+            for i in range(self._queue.qsize()):
+                packet = self._queue.get(block=False)
+                if packet is None:
+                    # Hand out what we already have, the next read will see the device is gone
+                    self._queue.put(None)
+                    self._wakeup.set()
+                    break
+                self._rx += packet
+        except Empty:
+            pass
+        data = bytes(self._rx)
+        self._rx.clear()
+        return data
+
+    def fileno(self):
+        return self._wakeup.fileno() if self._wakeup is not None else None
+
+    @property
+    def dropped(self) -> int:
+        return self._queue.dropped if self._queue is not None else 0
+
+    @property
+    def bufferDepth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
 
     def _write(self, data: bytes) -> None:
         return self._epOut.write(data)
@@ -0,0 +1,194 @@
+"""
+Reception statistics of every device, kept incrementally in constant memory, to judge antenna placement or how
+busy a stick is.
+
+    tracker = LinkQualityTracker()
+    node.start(tracker.observe, onFailure)
+    ...
+    for (deviceNumber, deviceType), stats in tracker.snapshot().items():
+        print(deviceNumber, stats.rssiMean, stats.rate, stats.lossRate)
+"""
+
+import time
+from threading import Lock
+
+from libAnt.constants import ANTPLUS_PROFILE_PERIODS
+from libAnt.profiles.profile import ProfileMessage
+
+_rxTimestampRollover = 65536  # The rx timestamp counts 1/32768 sec in 16 bits, so it rolls over every 2 seconds
+
+
+class LinkStats:
+    """
+    Running reception statistics of one device. RSSI values are in dBm, times in seconds.
+    """
+
+    __slots__ = ('deviceNumber', 'deviceType', 'count', 'missed', 'rssiCount', 'rssiSum', 'rssiMin', 'rssiMax',
+                 'firstSeen', 'lastSeen', 'interval', '_lastEventCount', '_lastRxTimestamp')
+
+    def __init__(self, deviceNumber: int, deviceType: int):
+        self.deviceNumber = deviceNumber
+        self.deviceType = deviceType
+        self.count = 0  # Messages received
+        self.missed = 0  # Messages estimated to be lost
+        self.rssiCount = 0
+        self.rssiSum = 0
+        self.rssiMin = None
+        self.rssiMax = None
+        self.firstSeen = None
+        self.lastSeen = None
+        self.interval = None  # Exponentially weighted time between messages
+        self._lastEventCount = None
+        self._lastRxTimestamp = None
+
+    def __str__(self):
+        return '{} ({}): {} msgs, {:.1f} msg/s, {:.1%} lost, RSSI {} dBm'.format(
+            self.deviceNumber, self.deviceType, self.count, self.rate, self.lossRate,
+            'n/a' if self.rssiMean is None else '{:.1f} ({}..{})'.format(self.rssiMean, self.rssiMin, self.rssiMax))
+
+    def copy(self):
+        other = LinkStats(self.deviceNumber, self.deviceType)
+        for name in self.__slots__:
+            setattr(other, name, getattr(self, name))
+        return other
+
+    @property
+    def rssiMean(self) -> float:
+        return self.rssiSum / self.rssiCount if self.rssiCount else None
+
+    @property
+    def rate(self) -> float:
+        """ Current message rate (msg/s), weighted towards the latest messages """
+        return 1 / self.interval if self.interval else 0.0
+
+    @property
+    def averageRate(self) -> float:
+        """ Message rate (msg/s) since the device was first seen """
+        if self.count < 2 or self.lastSeen == self.firstSeen:
+            return 0.0
+        return (self.count - 1) / (self.lastSeen - self.firstSeen)
+
+    @property
+    def lossRate(self) -> float:
+        """ Fraction of the device's messages which were lost """
+        total = self.count + self.missed
+        return self.missed / total if total else 0.0
+
+    def sinceLastSeen(self, now: float = None) -> float:
+        """
+        :param now: Current time, in the same clock as the message timestamps. time.time() if omitted.
+        """
+        if self.lastSeen is None:
+            return None
+        return (now if now is not None else time.time()) - self.lastSeen
+
+
+class LinkQualityTracker:
+    """
+    Keeps LinkStats for every device, updated with each message passed to observe().
+    It takes BroadcastMessages (a node callback) or profile messages (a factory callback).
+
+    Lost messages are estimated from gaps in the event count of profiles which have one (like the power profile).
+    Otherwise they are estimated from the time between messages and the device type's message period, using the
+    rx timestamp of extended messages when there is one.
+    """
+
+    def __init__(self, periods: dict = None, smoothing: float = 0.1):
+        """
+        :param periods: Device type -> message period (1/32768 sec), the ANT+ profile periods by default
+        :param smoothing: Weight of the latest message in the current message rate, between 0 and 1
+        """
+        self._periods = periods if periods is not None else ANTPLUS_PROFILE_PERIODS
+        self._smoothing = smoothing
+        self._lock = Lock()
+        self._devices = {}
+
+    def __call__(self, msg, timestamp: float = None) -> LinkStats:
+        return self.observe(msg, timestamp)
+
+    def __len__(self):
+        return len(self._devices)
+
+    def observe(self, msg, timestamp: float = None) -> LinkStats:
+        """
+        :param msg: BroadcastMessage or profile message
+        :param timestamp: Time the message was received, the profile message's timestamp or time.time() if omitted
+        :return: The updated statistics of the message's device, None if the message has no channel ID
+        """
+        eventCount = maxEventCount = None
+        if isinstance(msg, ProfileMessage):
+            if timestamp is None:
+                timestamp = msg.timestamp
+            if hasattr(msg, 'eventCount'):
+                eventCount, maxEventCount = msg.eventCount, msg.maxEventCount
+            msg = msg.msg
+        if timestamp is None:
+            timestamp = time.time()
+        deviceNumber = msg.deviceNumber
+        if deviceNumber is None:
+            return None
+        key = (deviceNumber, msg.deviceType)
+        rssi = msg.rssiDbm
+        rxTimestamp = msg.rxTimestamp
+        if rxTimestamp is not None and rxTimestamp >= _rxTimestampRollover:
+            rxTimestamp = None  # Not the 2 byte timestamp of the spec, fall back to the arrival times
+
+        with self._lock:
+            stats = self._devices.get(key)
+            if stats is None:
+                stats = self._devices[key] = LinkStats(*key)
+                stats.firstSeen = timestamp
+            elif timestamp > stats.lastSeen:
+                elapsed = timestamp - stats.lastSeen
+                if stats.interval is None:
+                    stats.interval = elapsed
+                else:
+                    stats.interval += self._smoothing * (elapsed - stats.interval)
+                stats.missed += self._missed(stats, eventCount, maxEventCount, rxTimestamp, elapsed)
+            stats.count += 1
+            stats.lastSeen = timestamp
+            stats._lastEventCount = eventCount
+            stats._lastRxTimestamp = rxTimestamp
+            if rssi is not None:
+                stats.rssiCount += 1
+                stats.rssiSum += rssi
+                if stats.rssiMin is None or rssi < stats.rssiMin:
+                    stats.rssiMin = rssi
+                if stats.rssiMax is None or rssi > stats.rssiMax:
+                    stats.rssiMax = rssi
+        return stats
+
+    def _missed(self, stats: LinkStats, eventCount: int, maxEventCount: int, rxTimestamp: int,
+                elapsed: float) -> int:
+        """
+        :return: Number of messages which should have arrived since the last one, but didn't
+        """
+        if eventCount is not None and stats._lastEventCount is not None:
+            diff = (eventCount - stats._lastEventCount) % maxEventCount
+            return diff - 1 if diff > 1 else 0
+        period = self._periods.get(stats.deviceType)
+        if period is None:
+            return 0
+        ticks = elapsed * 32768
+        if rxTimestamp is not None and stats._lastRxTimestamp is not None and ticks < _rxTimestampRollover * 0.75:
+            ticks = (rxTimestamp - stats._lastRxTimestamp) % _rxTimestampRollover
+        return max(0, round(ticks / period) - 1)
+
+    def get(self, deviceNumber: int, deviceType: int) -> LinkStats:
+        """
+        :return: A copy of the statistics of the device, or None if it has not been seen
+        """
+        with self._lock:
+            stats = self._devices.get((deviceNumber, deviceType))
+            return stats.copy() if stats is not None else None
+
+    def snapshot(self) -> dict:
+        """
+        :return: (deviceNumber, deviceType) -> copy of the LinkStats of every device
+        """
+        with self._lock:
+            return {key: stats.copy() for key, stats in self._devices.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._devices = {}
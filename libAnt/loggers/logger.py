@@ -1,7 +1,29 @@
+from threading import Condition, Lock, Thread
+
+
 class Logger:
-    def __init__(self, logFile: str):
+    """
+    Frames are encoded into a preallocated buffer, which a background thread writes to the log file when it fills up,
+    or at least every flushInterval seconds. So logging costs the read path little more than a copy.
+    Subclasses encode frames with encodeInto (or encodeData), adding at most recordOverhead bytes to each.
+    """
+
+    recordOverhead = 0
+
+    def __init__(self, logFile: str, bufferSize: int = 65536, flushInterval: float = 1.0):
         self._logFile = logFile
         self._log = None
+        self._bufferSize = bufferSize
+        self._flushInterval = flushInterval
+        self._lock = Lock()
+        self._condition = Condition(self._lock)
+        self._buffer = None  # Being filled
+        self._length = 0
+        self._spare = None  # None while the writer has it
+        self._pending = None  # (buffer, length) to be written
+        self._closed = False
+        self._writer = None
+        self._error = None  # Raised by the writer, reported by the next call of log, flush or close
 
     def __enter__(self):
         self.open()
@@ -34,15 +56,96 @@ class Logger:
         self._logFile = validate(self._logFile)
         self._log = open(self._logFile, 'wb')
         self.onOpen()
+        self._buffer = bytearray(self._bufferSize)
+        self._spare = bytearray(self._bufferSize)
+        self._length = 0
+        self._pending = None
+        self._closed = False
+        self._error = None
+        self._writer = Thread(target=self._write, daemon=True)
+        self._writer.start()
 
     def close(self):
         if self._log is not None:
-            self.beforeClose()
-            self._log.close()
+            with self._condition:
+                self._closed = True
+                self._condition.notify_all()
+            self._writer.join()
+            self._writer = None
+            try:
+                self.beforeClose()
+            finally:
+                self._log.close()
+                self._log = None
             self.afterClose()
+            with self._lock:
+                self._raiseError()
 
     def log(self, data: bytes):
-        self._log.write(self.encodeData(data))
+        size = self.recordOverhead + len(data)
+        with self._lock:
+            self._raiseError()
+            if self._length + size > len(self._buffer):
+                self._handOver(size)
+            self._length = self.encodeInto(self._buffer, self._length, data)
+
+    def flush(self):
+        """ Writes everything logged so far to the file """
+        with self._condition:
+            if self._length:
+                self._handOver(0)
+            while self._pending is not None:
+                self._condition.wait()
+            self._raiseError()
+        self._log.flush()
+
+    def _raiseError(self):
+        """ Raises the error the writer ran into, once. Call with the lock held. """
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _handOver(self, size: int):
+        """ Passes the current buffer to the writer, to make room for size bytes. Call with the condition held. """
+        while self._spare is None:
+            self._condition.wait()
+        self._swap()
+        if size > len(self._buffer):
+            self._buffer = bytearray(size)
+        self._condition.notify_all()
+
+    def _swap(self):
+        self._pending = (self._buffer, self._length)
+        self._buffer = self._spare
+        self._spare = None
+        self._length = 0
+
+    def _write(self):
+        while True:
+            with self._condition:
+                if self._pending is None and not self._closed:
+                    self._condition.wait(self._flushInterval)
+                if self._pending is None:
+                    if self._length:
+                        self._swap()
+                    elif self._closed:
+                        return
+                    else:
+                        continue
+                buffer, length = self._pending
+            error = None
+            try:
+                with memoryview(buffer) as view, view[:length] as data:
+                    self._log.write(data)
+                self._log.flush()
+            except Exception as e:
+                error = e  # The buffer is lost, but handed back so log() does not wait for it forever
+            with self._condition:
+                if error is not None:
+                    self._error = error
+                self._pending = None
+                self._spare = buffer
+                self._condition.notify_all()
 
     def onOpen(self):
         pass
@@ -53,5 +156,15 @@ class Logger:
     def afterClose(self):
         pass
 
+    def encodeInto(self, buffer: bytearray, offset: int, data: bytes) -> int:
+        """
+        Encodes a frame into buffer, which has room for at least recordOverhead + len(data) bytes at offset
+        :return: Offset after the encoded frame
+        """
+        encoded = self.encodeData(data)
+        end = offset + len(encoded)
+        buffer[offset:end] = encoded
+        return end
+
     def encodeData(self, data):
-        return data
\ No newline at end of file
+        return data
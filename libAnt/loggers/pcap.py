@@ -1,10 +1,13 @@
 from struct import Struct
 import time
-import math
 
 from libAnt.loggers.logger import Logger
 
 class PcapLogger(Logger):
+    recordOverhead = 16
+    # Frame length -> Struct packing the packet header and the frame at once
+    _records = {}
+
     def onOpen(self):
         # write pcap global header
         magic_number = b'\xD4\xC3\xB2\xA1'
@@ -19,14 +22,18 @@ class PcapLogger(Logger):
             pcap_global_header.pack(magic_number, version_major, version_minor, thiszone, sigfigs,
                                     snaplen, network))
 
-    def encodeData(self, data):
+    def encodeInto(self, buffer, offset, data):
         timestamp = time.time()
-        frac, whole = math.modf(timestamp)
-
-        ts_sec = int(whole).to_bytes(4, byteorder='little')
-        ts_usec = int(frac * 1000 * 1000).to_bytes(4, byteorder='little')
+        ts_sec = int(timestamp)
+        ts_usec = int((timestamp - ts_sec) * 1000000)
         incl_len = len(data)
-        orig_len = incl_len
+        record = self._records.get(incl_len)
+        if record is None:
+            record = self._records[incl_len] = Struct('<IIII{}s'.format(incl_len))
+        record.pack_into(buffer, offset, ts_sec, ts_usec, incl_len, incl_len, data)
+        return offset + record.size
 
-        pcap_packet_header = Struct('<4s4sll').pack(ts_sec, ts_usec, incl_len, orig_len)
-        return pcap_packet_header + data
\ No newline at end of file
+    def encodeData(self, data):
+        buffer = bytearray(self.recordOverhead + len(data))
+        self.encodeInto(buffer, 0, data)
+        return bytes(buffer)
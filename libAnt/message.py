@@ -2,6 +2,8 @@ from libAnt.constants import *
 
 
 class Message:
+    __slots__ = ('_type', '_content')
+
     def __init__(self, type: int, content: bytes):
         self._type = type
         self._content = content
@@ -10,7 +12,7 @@ class Message:
         return len(self._content)
 
     def __iter__(self):
-        return self._content
+        return iter(self._content)
 
     def __str__(self):
         return '({:02X}): '.format(self._type) + ' '.join('{:02X}'.format(x) for x in self._content)
@@ -36,41 +38,57 @@ class Message:
         return self._content
 
 
+def _extendedLayout(flag: int) -> tuple:
+    """
+    :return: (minimum length of the raw message, offset of the channel ID, of the RSSI and of the rx timestamp),
+             offsets are None for fields the flag does not include
+    """
+    offset = 10
+    offsets = []
+    for field, length in ((EXT_FLAG_CHANNEL_ID, 4), (EXT_FLAG_RSSI, 3), (EXT_FLAG_TIMESTAMP, 2)):
+        if flag & field:
+            offsets.append(offset)
+            offset += length
+        else:
+            offsets.append(None)
+    return (offset,) + tuple(offsets)
+
+
+_layouts = [_extendedLayout(flag) for flag in range(256)]  # By flag, bits of other fields are ignored
+_noLayout = (9, None, None, None)
+
+
 class BroadcastMessage(Message):
-    def __init__(self, type: int, content: bytes):
-        self.flag = None
-        self.deviceNumber = self.deviceType = self.transType = None
-        self.rssiMeasurementType = self.rssi = self._rssiThreshold = None
-        self.rssi = None
-        self.rssiThreshold = None
-        self.rxTimestamp = None
-        self.channel = None
-        self.extendedContent = None
+    """
+    Broadcast data. The extended fields are decoded from the raw message only when they are read, build() only
+    looks up where they are.
+    Instances are immutable once built, so they can be shared between consumers without copying.
+    """
+
+    __slots__ = ('_raw', '_layout')
 
+    def __init__(self, type: int, content: bytes):
         super().__init__(type, content)
+        self._raw = b''
+        self._layout = _noLayout
 
     def build(self, raw: bytes):
+        """
+        Raises ValueError if raw is shorter than its extended message flag says
+        """
+        length = len(raw)
+        if length > 9:
+            layout = _layouts[raw[9]]
+            if length < layout[0]:
+                raise ValueError('Extended broadcast message too short: {} bytes, flag 0x{:02X}'.format(length, raw[9]))
+        elif length == 9:
+            layout = _noLayout
+        else:
+            raise ValueError('Broadcast message too short: {} bytes'.format(length))
         self._type = MESSAGE_CHANNEL_BROADCAST_DATA
-        self.channel = raw[0]
+        self._raw = raw
+        self._layout = layout
         self._content = raw[1:9]
-        if len(raw) > 9:  # Extended message
-            self.flag = raw[9]
-            self.extendedContent = raw[10:]
-            offset = 0
-            if self.flag & EXT_FLAG_CHANNEL_ID:
-                self.deviceNumber = int.from_bytes(self.extendedContent[:2], byteorder='little', signed=False)
-                self.deviceType = self.extendedContent[2]
-                self.transType = self.extendedContent[3]
-                offset += 4
-            if self.flag & EXT_FLAG_RSSI:
-                rssi = self.extendedContent[offset:(offset + 3)]
-                self.rssiMeasurementType = rssi[0]
-                self.rssi = rssi[1]
-                self.rssiThreshold = rssi[2]
-                offset += 3
-            if self.flag & EXT_FLAG_TIMESTAMP:
-                self.rxTimestamp = int.from_bytes(self.extendedContent[offset:],
-                                                  byteorder='little', signed=False)
         return self
 
     def checksum(self) -> int:
@@ -79,13 +97,82 @@ class BroadcastMessage(Message):
     def encode(self) -> bytes:
         pass
 
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    @property
+    def raw(self) -> bytes:
+        return self._raw
+
+    @property
+    def channel(self) -> int:
+        return self._raw[0] if self._raw else None
+
+    @property
+    def flag(self) -> int:
+        return self._raw[9] if len(self._raw) > 9 else None
+
+    @property
+    def extendedContent(self) -> bytes:
+        return self._raw[10:] if len(self._raw) > 9 else None
+
+    @property
+    def deviceNumber(self) -> int:
+        offset = self._layout[1]
+        return None if offset is None else self._raw[offset] | (self._raw[offset + 1] << 8)
+
+    @property
+    def deviceType(self) -> int:
+        offset = self._layout[1]
+        return None if offset is None else self._raw[offset + 2]
+
+    @property
+    def transType(self) -> int:
+        offset = self._layout[1]
+        return None if offset is None else self._raw[offset + 3]
+
+    @property
+    def rssiMeasurementType(self) -> int:
+        offset = self._layout[2]
+        return None if offset is None else self._raw[offset]
+
+    @property
+    def rssi(self) -> int:
+        offset = self._layout[2]
+        return None if offset is None else self._raw[offset + 1]
+
+    @property
+    def rssiDbm(self) -> int:
+        """ The RSSI as a signed value (dBm), None if the message has no RSSI """
+        rssi = self.rssi
+        if rssi is None:
+            return None
+        return rssi - 256 if rssi > 127 else rssi
+
+    @property
+    def rssiThreshold(self) -> int:
+        offset = self._layout[2]
+        return None if offset is None else self._raw[offset + 2]
+
+    @property
+    def rxTimestamp(self) -> int:
+        offset = self._layout[3]
+        return None if offset is None else int.from_bytes(self._raw[offset:], byteorder='little', signed=False)
+
 
 class SystemResetMessage(Message):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(MESSAGE_SYSTEM_RESET, b'0')
 
 
 class SetNetworkKeyMessage(Message):
+    __slots__ = ()
+
     def __init__(self, channel: int, key: bytes = ANTPLUS_NETWORK_KEY):
         content = bytearray([channel])
         content.extend(key)
@@ -93,6 +180,8 @@ class SetNetworkKeyMessage(Message):
 
 
 class AssignChannelMessage(Message):
+    __slots__ = ()
+
     def __init__(self, channel: int, type: int, network: int = 0, extended: int = None):
         content = bytearray([channel, type, network])
         if extended is not None:
@@ -101,32 +190,86 @@ class AssignChannelMessage(Message):
 
 
 class SetChannelIdMessage(Message):
+    __slots__ = ()
+
     def __init__(self, channel: int, deviceNumber: int = 0, deviceType: int = 0, transType: int = 0):
         content = bytearray([channel])
-        content.extend(deviceNumber.to_bytes(2, byteorder='big'))
+        content.extend(deviceNumber.to_bytes(2, byteorder='little'))
         content.append(deviceType)
         content.append(transType)
         super().__init__(MESSAGE_CHANNEL_ID, bytes(content))
 
 
+class UnassignChannelMessage(Message):
+    __slots__ = ()
+
+    def __init__(self, channel: int):
+        super().__init__(MESSAGE_CHANNEL_UNASSIGN, bytes([channel]))
+
+
+class SetChannelPeriodMessage(Message):
+    __slots__ = ()
+
+    def __init__(self, channel: int, period: int = 8192):
+        content = bytearray([channel])
+        content.extend(period.to_bytes(2, byteorder='little'))
+        super().__init__(MESSAGE_CHANNEL_PERIOD, bytes(content))
+
+
+class SetChannelSearchTimeoutMessage(Message):
+    __slots__ = ()
+
+    def __init__(self, channel: int, timeout: int = TIMEOUT_NEVER):
+        super().__init__(MESSAGE_CHANNEL_SEARCH_TIMEOUT, bytes([channel, timeout]))
+
+
+class OpenChannelMessage(Message):
+    __slots__ = ()
+
+    def __init__(self, channel: int):
+        super().__init__(MESSAGE_CHANNEL_OPEN, bytes([channel]))
+
+
+class CloseChannelMessage(Message):
+    __slots__ = ()
+
+    def __init__(self, channel: int):
+        super().__init__(MESSAGE_CHANNEL_CLOSE, bytes([channel]))
+
+
+class RequestMessage(Message):
+    __slots__ = ()
+
+    def __init__(self, channel: int, messageId: int):
+        super().__init__(MESSAGE_CHANNEL_REQUEST, bytes([channel, messageId]))
+
+
 class SetChannelRfFrequencyMessage(Message):
+    __slots__ = ()
+
     def __init__(self, channel: int, frequency: int = 2457):
         content = bytes([channel, frequency - 2400])
         super().__init__(MESSAGE_CHANNEL_FREQUENCY, content)
 
 
 class OpenRxScanModeMessage(Message):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(OPEN_RX_SCAN_MODE, bytes([0]))
 
 
 class EnableExtendedMessagesMessage(Message):
+    __slots__ = ()
+
     def __init__(self, enable: bool = True):
         content = bytes([0, int(enable)])
         super().__init__(MESSAGE_ENABLE_EXT_RX_MESSAGES, content)
 
 
 class LibConfigMessage(Message):
+    __slots__ = ()
+
     def __init__(self, rxTimestamp: bool = True, rssi: bool = True, channelId: bool = True):
         config = 0
         if rxTimestamp:
@@ -0,0 +1,205 @@
+"""
+Counters and latency histograms of every stage a message goes through: raw bytes read by the driver, frames,
+broadcasts, profile messages and the callbacks, plus gauges of queue depths.
+Metrics are disabled by default, then each instrumented spot costs a single check of metrics.enabled.
+Updates are not locked, so under heavy contention from several threads a few of them may be lost.
+
+    from libAnt import metrics
+    metrics.enable()
+    ...
+    print(metrics.registry.exposition())
+"""
+
+from bisect import bisect_left
+from threading import Lock
+
+enabled = False
+
+
+def enable() -> None:
+    global enabled
+    enabled = True
+
+
+def disable() -> None:
+    global enabled
+    enabled = False
+
+
+class Counter:
+    __slots__ = ('name', 'help', 'value')
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+
+class Histogram:
+    """
+    Counts observations in fixed buckets, given by their upper bounds. Observations above the last bound go into an
+    overflow bucket.
+    """
+
+    __slots__ = ('name', 'help', 'bounds', 'counts', 'sum', 'count')
+
+    # Seconds, from 1µs to 1s
+    defaultBounds = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2,
+                     5e-2, 0.1, 0.25, 0.5, 1.0)
+
+    def __init__(self, name: str, help: str, bounds=None):
+        self.name = name
+        self.help = help
+        self.bounds = tuple(bounds) if bounds is not None else self.defaultBounds
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def reset(self) -> None:
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Gauge:
+    """
+    A value which is only computed when it is read, by calling fn. So it costs nothing while nobody looks.
+    """
+
+    __slots__ = ('name', 'help', 'fn', 'labels')
+
+    def __init__(self, name: str, help: str, fn, labels: dict = None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labels = tuple(sorted(labels.items())) if labels else ()
+
+    @property
+    def value(self):
+        return self.fn()
+
+
+class Registry:
+    def __init__(self):
+        self._lock = Lock()
+        self._metrics = {}  # name -> Counter or Histogram
+        self._gauges = {}  # (name, labels) -> Gauge
+
+    def counter(self, name: str, help: str) -> Counter:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, help)
+            return self._metrics[name]
+
+    def histogram(self, name: str, help: str, bounds=None) -> Histogram:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, help, bounds)
+            return self._metrics[name]
+
+    def gauge(self, name: str, help: str, fn, labels: dict = None) -> Gauge:
+        """ Registers a gauge, replacing the one with the same name and labels """
+        gauge = Gauge(name, help, fn, labels)
+        with self._lock:
+            self._gauges[(name, gauge.labels)] = gauge
+        return gauge
+
+    def removeGauge(self, gauge: Gauge) -> None:
+        with self._lock:
+            if self._gauges.get((gauge.name, gauge.labels)) is gauge:
+                del self._gauges[(gauge.name, gauge.labels)]
+
+    def reset(self) -> None:
+        """ Zeroes every counter and histogram """
+        with self._lock:
+            for metric in self._metrics.values():
+                if isinstance(metric, Counter):
+                    metric.value = 0
+                else:
+                    metric.reset()
+
+    def snapshot(self) -> dict:
+        """
+        :return: name -> value for counters, name -> {'bounds', 'counts', 'sum', 'count'} for histograms and
+                 name -> list of (labels, value) for gauges
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+            gauges = list(self._gauges.values())
+        result = {}
+        for metric in metrics:
+            if isinstance(metric, Counter):
+                result[metric.name] = metric.value
+            else:
+                result[metric.name] = {'bounds': list(metric.bounds), 'counts': list(metric.counts),
+                                       'sum': metric.sum, 'count': metric.count}
+        for gauge in gauges:
+            result.setdefault(gauge.name, []).append((dict(gauge.labels), gauge.value))
+        return result
+
+    def exposition(self) -> str:
+        """
+        :return: Every metric in the Prometheus text format
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+            gauges = sorted(self._gauges.values(), key=lambda g: (g.name, g.labels))
+        lines = []
+        for metric in metrics:
+            lines.append('# HELP {} {}'.format(metric.name, metric.help))
+            if isinstance(metric, Counter):
+                lines.append('# TYPE {} counter'.format(metric.name))
+                lines.append('{} {}'.format(metric.name, metric.value))
+            else:
+                lines.append('# TYPE {} histogram'.format(metric.name))
+                counts = list(metric.counts)
+                cumulative = 0
+                for bound, count in zip(metric.bounds + (float('inf'),), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append('{}_bucket{{le="{}"}} {}'.format(metric.name, le, cumulative))
+                lines.append('{}_sum {}'.format(metric.name, repr(metric.sum)))
+                lines.append('{}_count {}'.format(metric.name, cumulative))
+        name = None
+        for gauge in gauges:
+            if gauge.name != name:
+                name = gauge.name
+                lines.append('# HELP {} {}'.format(gauge.name, gauge.help))
+                lines.append('# TYPE {} gauge'.format(gauge.name))
+            labels = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                              for k, v in gauge.labels)
+            lines.append('{}{} {}'.format(gauge.name, '{' + labels + '}' if labels else '', gauge.value))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# Driver
+bytesRead = registry.counter('libant_bytes_read_total', 'Raw bytes read from devices')
+frames = registry.counter('libant_frames_total', 'Valid frames decoded from the raw bytes')
+checksumErrors = registry.counter('libant_checksum_errors_total', 'Frames dropped because of a bad checksum')
+resyncs = registry.counter('libant_resyncs_total', 'Times bytes had to be skipped to find the next frame')
+decodeSeconds = registry.histogram('libant_decode_seconds', 'Time to decode a chunk of raw bytes into frames')
+
+# Pump
+broadcasts = registry.counter('libant_broadcasts_total', 'Broadcast messages passed to the node callback')
+callbackSeconds = registry.histogram('libant_callback_seconds', 'Time spent in the node callback per broadcast')
+commandSeconds = registry.histogram('libant_command_seconds', 'Time from sending a command to its response')
+commandRetries = registry.counter('libant_command_retries_total', 'Commands resent because no response arrived')
+commandTimeouts = registry.counter('libant_command_timeouts_total', 'Commands which never got a response')
+reconnects = registry.counter('libant_reconnects_total', 'Times the pump reopened the driver')
+failures = registry.counter('libant_failures_total', 'Errors which closed the connection to the device')
+
+# Factory
+profileMessages = registry.counter('libant_profile_messages_total', 'Profile messages decoded')
+profileSeconds = registry.histogram('libant_profile_decode_seconds', 'Time to decode a broadcast into a profile message')
+profileCallbackSeconds = registry.histogram('libant_profile_callback_seconds',
+                                            'Time spent in the factory callback per profile message')
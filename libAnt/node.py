@@ -1,11 +1,75 @@
+import heapq
+import itertools
+import selectors
 import threading
+import time
+from collections import deque, OrderedDict
+from concurrent.futures import Future
 from queue import Queue, Empty
-from time import sleep
 
-from libAnt.drivers.driver import Driver
+from libAnt import metrics
+from libAnt.core import BatchCallback, QueuedCallback, BLOCK
+from libAnt.drivers.driver import Driver, Wakeup
 from libAnt.message import *
 
 
+class ResponseError(Exception):
+    """ The device rejected a message """
+
+    def __init__(self, response: Message):
+        self.response = response
+        self.code = response.content[2]
+        super().__init__('Message 0x{:02X} on channel {} failed with code 0x{:02X}'.format(
+            response.content[1], response.content[0], self.code))
+
+
+def responseKey(msg: Message):
+    """
+    :return: (channel, message id) of the response the device sends to msg, or None if it does not answer it.
+             The channel is None for responses which are messages of their own instead of channel events.
+    """
+    if msg.type == MESSAGE_SYSTEM_RESET:
+        return None, MESSAGE_STARTUP
+    if msg.type == MESSAGE_CHANNEL_REQUEST:
+        return None, msg.content[1]
+    if msg.type in (MESSAGE_CHANNEL_BROADCAST_DATA, MESSAGE_CHANNEL_ACKNOWLEDGED_DATA, MESSAGE_CHANNEL_BURST_DATA):
+        return None
+    return msg.content[0], msg.type
+
+
+class Command:
+    """
+    An outgoing message, and the future which is resolved with the device's response to it
+    """
+
+    def __init__(self, msg: Message, timeout: float = 1.0, retries: int = 2):
+        self.msg = msg
+        self.key = responseKey(msg)
+        self.timeout = timeout
+        # Resending a reset would undo the configuration sent after it
+        self.retries = 0 if msg.type == MESSAGE_SYSTEM_RESET else retries
+        self.deadline = None
+        self.sent = None
+        self.future = Future()
+
+
+def rxScanModeMessages(networkKey=ANTPLUS_NETWORK_KEY, channelType=CHANNEL_TYPE_ONEWAY_RECEIVE,
+                       frequency: int = 2457, rxTimestamp: bool = True, rssi: bool = True, channelId: bool = True):
+    """
+    :return: Messages which configure a device for continuous scanning mode with extended messages.
+             They do not include a reset, the node resets the device before sending its configuration.
+    """
+    return [
+        SetNetworkKeyMessage(0, networkKey),
+        AssignChannelMessage(0, channelType),
+        SetChannelIdMessage(0),
+        SetChannelRfFrequencyMessage(0, frequency),
+        EnableExtendedMessagesMessage(),
+        LibConfigMessage(rxTimestamp, rssi, channelId),
+        OpenRxScanModeMessage(),
+    ]
+
+
 class Network:
     def __init__(self, key: bytes = b'\x00' * 8, name: str = None):
         self.key = key
@@ -17,65 +81,200 @@ class Network:
 
 
 class Pump(threading.Thread):
+    """
+    Moves messages between the driver and the node. When the driver has a file descriptor, the pump sleeps in a
+    selector until either the device has data or an outgoing message is queued, so writes go out immediately and
+    an idle device costs nothing. Otherwise it falls back to polling with read timeouts.
+
+    Sent commands are indexed by the (channel, message id) of their expected response, so responses are matched in
+    constant time and several commands can be in flight at once. Commands which are not answered in time are resent
+    until they run out of retries.
+    """
+
     def __init__(self, driver: Driver, initMessages, out: Queue, onSucces, onFailure):
         super().__init__()
         self._stopper = threading.Event()
         self._driver = driver
         self._out = out
+        self._outReady = Wakeup()
         self._initMessages = initMessages
-        self._waiters = []
+        self._waiters = {}
+        self._deadlines = []
+        self._sequence = itertools.count()
         self._onSuccess = onSucces
         self._onFailure = onFailure
 
     def stop(self):
         self._driver.abort()
         self._stopper.set()
+        self._outReady.set()
 
     def stopped(self):
         return self._stopper.isSet()
 
+    def notify(self):
+        """ Wakes the pump up to send the queued outgoing messages """
+        self._outReady.set()
+
     def run(self):
+        connected = False
         while not self.stopped():
+            if connected and metrics.enabled:
+                metrics.reconnects.inc()
+            connected = True
             try:
                 with self._driver as d:
                     # Startup
-                    rst = SystemResetMessage()
-                    self._waiters.append(rst)
-                    d.write(rst)
-                    for m in self._initMessages:
-                        self._waiters.append(m)
-                        d.write(m)
-
-                    while not self.stopped():
-                        #  Write
-                        try:
-                            outMsg = self._out.get(block=False)
-                            self._waiters.append(outMsg)
-                            d.write(outMsg)
-                        except Empty:
-                            pass
+                    self._send(d, Command(SystemResetMessage()))
+                    for m in list(self._initMessages):
+                        self._send(d, Command(m))
+                    self._flush(d)
 
-                        # Read
-                        try:
-                            msg = d.read(timeout=1)
-                            if msg.type == MESSAGE_CHANNEL_EVENT:
-                                # This is a response to our outgoing message
-                                for w in self._waiters:
-                                    if w.type == msg.content[1]:  # ACK
-                                        self._waiters.remove(w)
-                                        #  TODO: Call waiter callback from tuple (waiter, callback)
-                                        break
-                            elif msg.type == MESSAGE_CHANNEL_BROADCAST_DATA:
-                                bmsg = BroadcastMessage(msg.type, msg.content).build(msg.content)
-                                self._onSuccess(bmsg)
-                        except Empty:
-                            pass
+                    if d.fileno() is None:
+                        self._poll(d)
+                    else:
+                        self._select(d)
             except Exception as e:
+                if metrics.enabled:
+                    metrics.failures.inc()
+                self._abandon(e)
                 self._onFailure(e)
             except:
                 pass
-            self._waiters.clear()
-            sleep(1)
+            self._abandon()
+            self._stopper.wait(1)
+
+    def _select(self, d: Driver):
+        with selectors.DefaultSelector() as selector:
+            selector.register(d.fileno(), selectors.EVENT_READ, self._driver)
+            selector.register(self._outReady.fileno(), selectors.EVENT_READ, self._outReady)
+            while not self.stopped():
+                for key, events in selector.select(self._expire(d)):
+                    if key.data is self._outReady:
+                        self._outReady.clear()
+                        self._flush(d)
+                    else:
+                        try:
+                            for msg in d.readAll(timeout=0):
+                                self._handle(msg)
+                        except Empty:
+                            pass
+
+    def _poll(self, d: Driver):
+        while not self.stopped():
+            self._flush(d)
+            timeout = self._expire(d)
+            try:
+                self._handle(d.read(timeout=1 if timeout is None else min(timeout, 1)))
+            except Empty:
+                pass
+
+    def _flush(self, d: Driver):
+        while True:
+            try:
+                command = self._out.get(block=False)
+            except Empty:
+                return
+            self._send(d, command)
+
+    def _send(self, d: Driver, command: Command):
+        if command.future.done():  # Cancelled while it was queued
+            return
+        d.write(command.msg)
+        command.sent = time.monotonic()
+        if command.key is None:
+            command.future.set_result(None)
+            return
+        self._waiters.setdefault(command.key, deque()).append(command)
+        self._schedule(command)
+
+    def _schedule(self, command: Command):
+        command.deadline = time.monotonic() + command.timeout
+        heapq.heappush(self._deadlines, (command.deadline, next(self._sequence), command))
+
+    def _expire(self, d: Driver):
+        """
+        Resends or fails the commands which were not answered in time
+        :return: Seconds until the next deadline, or None if nothing is waiting for a response
+        """
+        now = time.monotonic()
+        while self._deadlines:
+            deadline, _, command = self._deadlines[0]
+            if command.future.done() or deadline != command.deadline:
+                heapq.heappop(self._deadlines)  # Answered, cancelled or rescheduled
+            elif deadline > now:
+                return deadline - now
+            else:
+                heapq.heappop(self._deadlines)
+                if command.retries > 0:
+                    command.retries -= 1
+                    d.write(command.msg)
+                    self._schedule(command)
+                    if metrics.enabled:
+                        metrics.commandRetries.inc()
+                else:
+                    self._forget(command)
+                    if metrics.enabled:
+                        metrics.commandTimeouts.inc()
+                    command.future.set_exception(TimeoutError('No response to {}'.format(command.msg)))
+        return None
+
+    def _forget(self, command: Command):
+        waiting = self._waiters.get(command.key)
+        if waiting is not None:
+            waiting.remove(command)
+            if not waiting:
+                del self._waiters[command.key]
+
+    def _respond(self, key, msg: Message, error: Exception = None):
+        waiting = self._waiters.get(key)
+        if waiting is None:
+            return
+        while waiting:
+            command = waiting.popleft()
+            if not command.future.done():
+                if metrics.enabled:
+                    metrics.commandSeconds.observe(time.monotonic() - command.sent)
+                if error is None:
+                    command.future.set_result(msg)
+                else:
+                    command.future.set_exception(error)
+                break
+        if not waiting:
+            del self._waiters[key]
+
+    def _abandon(self, e: Exception = None):
+        """ Fails every command still waiting for a response, they are lost with the connection """
+        for waiting in self._waiters.values():
+            for command in waiting:
+                if not command.future.done():
+                    if e is None:
+                        command.future.cancel()
+                    else:
+                        command.future.set_exception(e)
+        self._waiters.clear()
+        self._deadlines.clear()
+
+    def _handle(self, msg: Message):
+        if msg.type == MESSAGE_CHANNEL_EVENT:
+            if msg.content[1] != 1:  # Message id 1 is an RF event, everything else responds to our messages
+                code = msg.content[2]
+                self._respond((msg.content[0], msg.content[1]), msg,
+                              None if code == RESPONSE_NO_ERROR else ResponseError(msg))
+        elif msg.type == MESSAGE_CHANNEL_BROADCAST_DATA:
+            try:
+                bmsg = BroadcastMessage(msg.type, msg.content).build(msg.content)
+            except ValueError:
+                return  # Truncated extended data
+            if metrics.enabled:
+                metrics.broadcasts.inc()
+                start = time.perf_counter()
+                self._onSuccess(bmsg)
+                metrics.callbackSeconds.observe(time.perf_counter() - start)
+            else:
+                self._onSuccess(bmsg)
+        else:
+            self._respond((None, msg.type), msg)
 
 
 class Node:
@@ -85,6 +284,9 @@ class Node:
         self._out = Queue()
         self._init = []
         self._pump = None
+        self._batcher = None
+        self._queue = None
+        self._gauges = []
         self._configMessages = Queue()
 
     def __enter__(self):
@@ -93,31 +295,207 @@ class Node:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.stop()
 
-    def start(self, onSuccess, onFailure):
+    def start(self, onSuccess, onFailure, batchSize: int = None, batchDelay: float = 0.05, queueSize: int = None,
+              queuePolicy: str = BLOCK):
+        """
+        :param batchSize: If set, onSuccess is called with lists of up to batchSize messages instead of each message,
+                          at most batchDelay seconds after the first message of the list was received
+        :param queueSize: If set, onSuccess runs on a thread of its own, fed by a queue of queueSize messages
+                          (0 for unlimited), so a slow consumer does not hold up reading the device.
+                          queuePolicy decides what happens when it is full, see BoundedQueue. KEEP_LATEST keeps the
+                          newest message of each device.
+        Exceptions raised by onSuccess on the batch or queue thread are passed to onFailure.
+        """
         if not self.isRunning():
+            if batchSize is not None:
+                self._batcher = onSuccess = BatchCallback(onSuccess, batchSize, batchDelay, onFailure)
+            if queueSize is not None:
+                self._queue = onSuccess = QueuedCallback(onSuccess, queueSize, queuePolicy,
+                                                         lambda m: (m.deviceNumber, m.deviceType), onFailure)
             self._pump = Pump(self._driver, self._init, self._out, onSuccess, onFailure)
             self._pump.start()
+            self._registerGauges()
 
     def enableRxScanMode(self, networkKey=ANTPLUS_NETWORK_KEY, channelType=CHANNEL_TYPE_ONEWAY_RECEIVE,
                          frequency: int = 2457, rxTimestamp: bool = True, rssi: bool = True, channelId: bool = True):
-        self._init.append(SystemResetMessage())
-        self._init.append(SetNetworkKeyMessage(0, networkKey))
-        self._init.append(AssignChannelMessage(0, channelType))
-        self._init.append(SetChannelIdMessage(0))
-        self._init.append(SetChannelRfFrequencyMessage(0, frequency))
-        self._init.append(EnableExtendedMessagesMessage())
-        self._init.append(LibConfigMessage(rxTimestamp, rssi, channelId))
-        self._init.append(OpenRxScanModeMessage())
+        self._init.extend(rxScanModeMessages(networkKey, channelType, frequency, rxTimestamp, rssi, channelId))
+
+    def write(self, msg: Message, timeout: float = 1.0, retries: int = 2) -> Future:
+        """
+        Queues a message to be sent to the device, it goes out as soon as the node is running
+        :param timeout: Seconds to wait for the response before resending the message
+        :param retries: Number of times the message is resent before giving up, resets are never resent
+        :return: Future resolved with the response. It fails with ResponseError if the device rejects the message,
+                 or TimeoutError if it never answers. Messages which get no response resolve to None once sent.
+        """
+        command = Command(msg, timeout, retries)
+        self._out.put(command)
+        if self._pump is not None:
+            self._pump.notify()
+        return command.future
+
+    def configure(self, messages) -> list:
+        """
+        Adds configuration messages which are sent again every time the device is (re)initialised
+        :return: Futures of the messages if the node is already running and they were sent right away
+        """
+        self._init.extend(messages)
+        if self.isRunning():
+            return [self.write(m) for m in messages]
+        return []
+
+    def unconfigure(self, messages) -> None:
+        """ Removes messages added with configure, so they are not sent on the next (re)initialisation """
+        removed = set(map(id, messages))
+        self._init[:] = [m for m in self._init if id(m) not in removed]
 
     def stop(self):
         if self.isRunning():
             self._pump.stop()
             self._pump.join()
+        if self._queue is not None:
+            self._queue.close()
+            self._queue = None
+        if self._batcher is not None:
+            self._batcher.close()
+            self._batcher = None
+        for gauge in self._gauges:
+            metrics.registry.removeGauge(gauge)
+        self._gauges = []
+
+    def _registerGauges(self):
+        """ Gauges only cost something when they are read, so they are registered even if metrics are disabled """
+        labels = {'node': self._name if self._name is not None else hex(id(self))}
+        driver, queue = self._driver, self._queue
+        gauges = [
+            ('libant_driver_buffer_depth', 'Chunks of data waiting in the driver buffer', lambda: driver.bufferDepth),
+            ('libant_driver_dropped', 'Chunks of data the driver dropped because its buffer was full',
+             lambda: driver.dropped),
+            ('libant_outgoing_depth', 'Messages waiting to be sent to the device', self._out.qsize),
+        ]
+        if queue is not None:
+            gauges += [
+                ('libant_callback_queue_depth', 'Messages waiting for the node callback', queue.queue.qsize),
+                ('libant_callback_dropped', 'Messages the callback queue dropped because it was full',
+                 lambda: queue.dropped),
+            ]
+        self._gauges = [metrics.registry.gauge(name, help, fn, labels) for name, help, fn in gauges]
 
     def isRunning(self):
         if self._pump is None:
             return False
         return self._pump.is_alive()
 
-    def getCapabilities(self):
-        pass
+    @property
+    def dropped(self) -> int:
+        """
+        :return: Number of messages discarded by the consumer queue, see start
+        """
+        return self._queue.dropped if self._queue is not None else 0
+
+    def getCapabilities(self) -> Future:
+        """
+        :return: Future resolved with the capabilities message of the device
+        """
+        return self.write(RequestMessage(0, MESSAGE_CAPABILITIES))
+
+
+class MultiNode:
+    """
+    Receives with several devices at once and merges their broadcasts into a single stream.
+    The same broadcast heard by more than one device within window seconds is delivered only once, from the device
+    which received it with the best RSSI. Messages are delivered in the order they were first heard, window seconds
+    later. The devices' own rx timestamps run on separate clocks, so the window is measured on the host clock.
+    """
+
+    def __init__(self, drivers, name: str = None, window: float = 0.05):
+        self._nodes = [Node(d, '{}-{}'.format(name, i) if name is not None else None) for i, d in enumerate(drivers)]
+        self._name = name
+        self._window = window
+        self._pending = OrderedDict()
+        self._condition = threading.Condition()
+        self._merger = None
+        self._stopped = True
+        self.duplicates = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def nodes(self) -> list:
+        return list(self._nodes)
+
+    def enableRxScanMode(self, *args, **kwargs):
+        for n in self._nodes:
+            n.enableRxScanMode(*args, **kwargs)
+
+    def write(self, msg: Message, timeout: float = 1.0, retries: int = 2) -> list:
+        """
+        Sends a message to every device
+        :return: One future per device, see Node.write
+        """
+        return [n.write(msg, timeout, retries) for n in self._nodes]
+
+    def start(self, onSuccess, onFailure):
+        if self.isRunning():
+            return
+        self._stopped = False
+        self._merger = threading.Thread(target=self._merge, args=(onSuccess,))
+        self._merger.start()
+        for n in self._nodes:
+            n.start(self._receive, onFailure)
+
+    def stop(self):
+        for n in self._nodes:
+            n.stop()
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._merger is not None:
+            self._merger.join()
+            self._merger = None
+
+    def isRunning(self):
+        return self._merger is not None and self._merger.is_alive()
+
+    @staticmethod
+    def _signedRssi(msg: BroadcastMessage) -> int:
+        rssi = msg.rssiDbm
+        return -128 if rssi is None else rssi
+
+    def _receive(self, msg: BroadcastMessage):
+        key = (msg.deviceNumber, msg.deviceType, msg.content)
+        with self._condition:
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = [time.monotonic() + self._window, msg]
+                if len(self._pending) == 1:
+                    self._condition.notify()
+            else:
+                self.duplicates += 1
+                if self._signedRssi(msg) > self._signedRssi(pending[1]):
+                    pending[1] = msg
+
+    def _merge(self, onSuccess):
+        while True:
+            ready = []
+            with self._condition:
+                while not ready:
+                    now = time.monotonic()
+                    # Entries are kept in arrival order, so they expire in order too
+                    while self._pending:
+                        key, (deadline, msg) = next(iter(self._pending.items()))
+                        if deadline > now and not self._stopped:
+                            break
+                        del self._pending[key]
+                        ready.append(msg)
+                    if ready:
+                        break
+                    if self._stopped:
+                        return
+                    self._condition.wait(deadline - now if self._pending else None)
+            for msg in ready:
+                onSuccess(msg)
@@ -1,66 +1,139 @@
+import time
 from threading import Lock
 
+from libAnt import metrics
+from libAnt.core import BatchCallback
 from libAnt.message import BroadcastMessage
 from libAnt.profiles.power_profile import PowerProfileMessage
 from libAnt.profiles.speed_cadence_profile import SpeedAndCadenceProfileMessage
 from libAnt.profiles.heartrate_profile import HeartRateProfileMessage
+from libAnt.profiles.snapshot import SnapshotStore
 
 
 class Factory:
-    types = {
-        120: HeartRateProfileMessage,
-        121: SpeedAndCadenceProfileMessage,
-        11: PowerProfileMessage
-    }
+    """
+    Decodes broadcasts into profile messages, keeping the latest message of every device.
+    Decoding only locks the shard of the message's device, and filter updates never block it: the filter is a
+    frozenset which is replaced as a whole. Callbacks run outside of any lock.
+    """
 
-    def __init__(self, callback=None):
+    # Registered profile classes, in registration order
+    _profiles = []
+    # (device type, data page) -> profile class, rebuilt from _profiles whenever they change
+    _dispatch = {}
+
+    shards = 16
+
+    def __init__(self, callback=None, batchSize: int = None, batchDelay: float = 0.05,
+                 snapshots: SnapshotStore = None):
+        """
+        :param batchSize: If set, callback is called with lists of up to batchSize profile messages instead of each
+                          message, at most batchDelay seconds after the first message of the list was decoded.
+                          Call flush() to deliver the messages still waiting.
+        :param snapshots: Store to keep the current values of every device in, before the callback is called
+        """
         self._filter = None
-        self._lock = Lock()
+        self._filterLock = Lock()
+        self._locks = [Lock() for i in range(self.shards)]
         self._messages = {}
-        self._callback = callback
+        self._snapshots = snapshots
+        self._callback = BatchCallback(callback, batchSize, batchDelay) if batchSize is not None else callback
 
     def enableFilter(self):
-        with self._lock:
+        with self._filterLock:
             if self._filter is None:
-                self._filter = {}
+                self._filter = frozenset()
 
     def disableFilter(self):
-        with self._lock:
-            if self._filter is not None:
-                self._filter = None
+        with self._filterLock:
+            self._filter = None
 
     def clearFilter(self):
-        with self._lock:
+        with self._filterLock:
             if self._filter is not None:
-                self._filter.clear()
+                self._filter = frozenset()
 
     def addToFilter(self, deviceNumber: int):
-        with self._lock:
+        with self._filterLock:
             if self._filter is not None:
-                self._filter[deviceNumber] = True
+                self._filter = self._filter | {deviceNumber}
 
     def removeFromFilter(self, deviceNumber: int):
-        with self._lock:
+        with self._filterLock:
             if self._filter is not None:
-                if deviceNumber in self._filter:
-                    del self._filter[deviceNumber]
+                self._filter = self._filter - {deviceNumber}
 
-    def parseMessage(self, msg: BroadcastMessage):
-        with self._lock:
-            if self._filter is not None:
-                if msg.deviceNumber not in self._filter:
-                    return
-            if msg.deviceType in Factory.types:
-                num = msg.deviceNumber
-                type = msg.deviceType
-                if type == 11: # Quick patch to filter out power messages with non-power info
-                    if msg.content[0] != 16:
-                        return
-                pmsg = self.types[type](msg, self._messages[(num, type)] if (num, type) in self._messages else None)
-                self._messages[(num, type)] = pmsg
-                if callable(self._callback):
-                    self._callback(pmsg)
+    def parseMessage(self, msg: BroadcastMessage, timestamp: float = None):
+        filter = self._filter
+        if filter is not None:
+            if msg.deviceNumber not in filter:
+                return
+        type = msg.deviceType
+        profile = self._dispatch.get((type, msg.content[0]))
+        if profile is not None:
+            num = msg.deviceNumber
+            key = (num, type, profile)
+            measure = metrics.enabled
+            if measure:
+                start = time.perf_counter()
+            with self._locks[((num << 8) | type) % len(self._locks)]:
+                pmsg = profile(msg, self._messages.get(key), timestamp)
+                self._messages[key] = pmsg
+            if self._snapshots is not None:
+                self._snapshots.update(pmsg)
+            if measure:
+                decoded = time.perf_counter()
+                metrics.profileMessages.inc()
+                metrics.profileSeconds.observe(decoded - start)
+            if callable(self._callback):
+                self._callback(pmsg)
+                if measure:
+                    metrics.profileCallbackSeconds.observe(time.perf_counter() - decoded)
+            return pmsg
+
+    @property
+    def snapshots(self) -> SnapshotStore:
+        return self._snapshots
 
     def reset(self):
-        with self._lock:
-            self._messages = {}
\ No newline at end of file
+        self._messages = {}
+
+    def flush(self):
+        if isinstance(self._callback, BatchCallback):
+            self._callback.close()
+
+    @classmethod
+    def register(cls, profile):
+        """
+        Makes every Factory decode messages of the device types and data pages declared by the profile class.
+        Profiles which declare their data pages take precedence over those which handle every page.
+        Can be used as a class decorator.
+        """
+        cls._profiles = [p for p in cls._profiles if p is not profile] + [profile]
+        cls._rebuild()
+        return profile
+
+    @classmethod
+    def unregister(cls, profile):
+        """ Stops decoding the profile, its pages go back to the profiles registered for them before """
+        cls._profiles = [p for p in cls._profiles if p is not profile]
+        cls._rebuild()
+
+    @classmethod
+    def _rebuild(cls):
+        """ Replaces the dispatch table as a whole, so parseMessage never sees it half built """
+        dispatch = {}
+        for profile in cls._profiles:
+            pages = profile.dataPages if profile.dataPages is not None else range(256)
+            for type in profile.deviceTypes:
+                for page in pages:
+                    current = dispatch.get((type, page))
+                    if profile.dataPages is None and current is not None and current.dataPages is not None:
+                        continue
+                    dispatch[(type, page)] = profile
+        cls._dispatch = dispatch
+
+
+Factory.register(HeartRateProfileMessage)
+Factory.register(SpeedAndCadenceProfileMessage)
+Factory.register(PowerProfileMessage)
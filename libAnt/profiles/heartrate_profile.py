@@ -5,8 +5,10 @@ from libAnt.profiles.profile import ProfileMessage
 class HeartRateProfileMessage(ProfileMessage):
     """ Message from Heart Rate Monitor """
 
-    def __init__(self, msg, previous):
-        super().__init__(msg, previous)
+    deviceTypes = (120,)
+
+    def __init__(self, msg, previous, timestamp: float = None):
+        super().__init__(msg, previous, timestamp)
 
     def __str__(self):
         return f'{self.heartrate}'
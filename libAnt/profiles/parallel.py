@@ -0,0 +1,98 @@
+import multiprocessing
+import os
+import queue
+import threading
+
+from libAnt.message import BroadcastMessage
+from libAnt.profiles.factory import Factory
+
+
+def _work(messages, callback):
+    factory = Factory(callback)
+    while True:
+        batch = messages.get()
+        if batch is None:
+            return
+        for msg in batch:
+            factory.parseMessage(msg)
+
+
+class ParallelFactory:
+    """
+    Decodes profile messages on several workers, each with a Factory of its own.
+    Devices are sharded by (deviceNumber, deviceType), so all messages of a device are decoded by the same worker,
+    in the order they arrived. The callback runs on the worker.
+
+    With processes=True the workers are separate processes, so decoding and the callback scale past one core.
+    The callback then has to be picklable (a module level function) and runs in the worker process.
+    Messages are sent to the workers in batches of batchSize; call flush() to send a partial batch.
+    """
+
+    def __init__(self, callback=None, workers: int = None, processes: bool = False, batchSize: int = 1):
+        self._callback = callback
+        self._workerCount = workers if workers is not None else os.cpu_count() or 1
+        self._processes = processes
+        self._batchSize = batchSize
+        self._lock = threading.Lock()
+        self._batches = [[] for i in range(self._workerCount)]
+        self._queues = []
+        self._workers = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        for i in range(self._workerCount):
+            if self._processes:
+                q = multiprocessing.Queue()
+                worker = multiprocessing.Process(target=_work, args=(q, self._callback), daemon=True)
+            else:
+                q = queue.Queue()
+                worker = threading.Thread(target=_work, args=(q, self._callback), daemon=True)
+            worker.start()
+            self._queues.append(q)
+            self._workers.append(worker)
+
+    def stop(self) -> None:
+        """ Decodes every message passed in so far, then stops the workers """
+        if not self._workers:
+            return
+        self.flush()
+        for q in self._queues:
+            q.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._queues = []
+        self._workers = []
+
+    def shard(self, msg: BroadcastMessage) -> int:
+        """
+        :return: Index of the worker which decodes messages of this device
+        """
+        if msg.deviceNumber is None:
+            return 0
+        return ((msg.deviceNumber << 8) | msg.deviceType) % self._workerCount
+
+    def parseMessage(self, msg: BroadcastMessage) -> None:
+        shard = self.shard(msg)
+        with self._lock:
+            batch = self._batches[shard]
+            batch.append(msg)
+            if len(batch) < self._batchSize:
+                return
+            self._batches[shard] = []
+            # Queued under the lock, so batches of the same shard can't overtake each other
+            self._queues[shard].put(batch)
+
+    def flush(self) -> None:
+        with self._lock:
+            for shard, batch in enumerate(self._batches):
+                if batch:
+                    self._batches[shard] = []
+                    self._queues[shard].put(batch)
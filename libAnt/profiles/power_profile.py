@@ -5,8 +5,12 @@ from libAnt.profiles.profile import ProfileMessage
 class PowerProfileMessage(ProfileMessage):
     """ Message from Power Meter """
 
+    deviceTypes = (11,)
+    dataPages = (0x10,)  # Standard power-only page
+
     maxAccumulatedPower = 65536
     maxEventCount = 256
+    historyProperties = ('accumulatedPowerDiff', 'eventCountDiff', 'averagePower')
 
     def __str__(self):
         return super().__str__() + ' Power: {0:.0f}W'.format(self.averagePower)
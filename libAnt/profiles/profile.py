@@ -1,22 +1,34 @@
-from copy import deepcopy
-
 import time
 
-from libAnt.message import BroadcastMessage
-
 
 class ProfileMessage:
-    def __init__(self, msg, previous):
+    """
+    Decoded message of a device profile. Only one step of history is kept: when the next message of the
+    device arrives, the values listed in historyProperties are resolved and the link to the previous
+    message is dropped, so memory stays constant no matter how long a device is tracked.
+    Subclasses declare the device types they decode, and optionally the data pages (first byte of the payload),
+    then get registered with Factory.register.
+    """
+
+    deviceTypes = ()
+    dataPages = None  # Every page
+    historyProperties = ()
+
+    def __init__(self, msg, previous, timestamp: float = None):
         self.previous = previous
-        self.msg = deepcopy(msg)
+        if previous is not None:
+            previous.detach()
+        self.msg = msg
         self.count = previous.count + 1 if previous is not None else 1
-        self.timestamp = time.time()
+        self.timestamp = timestamp if timestamp is not None else time.time()
         self.firstTimestamp = previous.firstTimestamp if previous is not None else self.timestamp
 
     def __str__(self):
         return str(self.msg.deviceNumber)
 
-    @staticmethod
-    def decode(cls, msg: BroadcastMessage):
-        if msg.deviceType in cls.match:
-            cls.match[msg.deviceType]()
\ No newline at end of file
+    def detach(self):
+        """ Resolves every value which depends on the previous message, then forgets it """
+        if self.previous is not None:
+            for name in self.historyProperties:
+                getattr(self, name)
+            self.previous = None
@@ -0,0 +1,118 @@
+from collections import namedtuple, OrderedDict
+from threading import Lock
+from types import MappingProxyType
+
+from libAnt.profiles.heartrate_profile import HeartRateProfileMessage
+from libAnt.profiles.power_profile import PowerProfileMessage
+from libAnt.profiles.speed_cadence_profile import SpeedAndCadenceProfileMessage
+
+DeviceSnapshot = namedtuple('DeviceSnapshot', ['deviceNumber', 'deviceType', 'version', 'lastSeen', 'rssi', 'power',
+                                               'cadence', 'speed', 'heartRate', 'message'])
+DeviceSnapshot.__doc__ = """
+Current values of a device. Values the device's profile does not provide are None.
+power is in W, cadence in rpm, speed in m/s and heartRate in bpm. message is the profile message they came from.
+"""
+
+
+class SnapshotStore:
+    """
+    Keeps the current values of every device, keyed by (deviceNumber, deviceType).
+    Pass it to a Factory (or use it as the callback) to have it updated as messages are decoded.
+
+    Every update publishes a new immutable DeviceSnapshot in place of the device's old one, so get() and snapshot()
+    never take a lock and an update costs the same however many devices there are. Writers only hold the lock to
+    number the update and move the device to the end of the update order, so changedSince() only looks at the
+    devices which actually changed.
+
+        store = SnapshotStore()
+        factory = Factory(snapshots=store)
+        ...
+        version, changed = store.changedSince(0)
+        while True:
+            version, changed = store.changedSince(version)
+    """
+
+    def __init__(self, wheelCircumference: int = 2096):
+        """
+        :param wheelCircumference: Wheel circumference (mm) used to compute the speed of speed sensors
+        """
+        self._wheelCircumference = wheelCircumference
+        self._lock = Lock()  # Serializes writers and changedSince
+        self._devices = {}  # (deviceNumber, deviceType) -> DeviceSnapshot, read without the lock
+        self._order = OrderedDict()  # Same keys, in the order they were last updated
+        self._version = 0
+
+    def __call__(self, msg) -> None:
+        self.update(msg)
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __contains__(self, key):
+        return key in self._devices
+
+    @property
+    def version(self) -> int:
+        """ Increases with every update, a version of 0 means no update yet """
+        return self._version
+
+    def update(self, msg) -> DeviceSnapshot:
+        """
+        :param msg: Decoded profile message
+        :return: The new snapshot of the message's device
+        """
+        bmsg = msg.msg
+        key = (bmsg.deviceNumber, bmsg.deviceType)
+        power = cadence = speed = heartRate = None
+        if isinstance(msg, PowerProfileMessage):
+            power = msg.averagePower
+            cadence = msg.instantaneousCadence
+        elif isinstance(msg, SpeedAndCadenceProfileMessage):
+            cadence = msg.cadence
+            speed = msg.speed(self._wheelCircumference)
+        elif isinstance(msg, HeartRateProfileMessage):
+            heartRate = msg.heartrate
+        rssi = bmsg.rssi
+
+        with self._lock:
+            version = self._version + 1
+            snapshot = DeviceSnapshot(key[0], key[1], version, msg.timestamp, rssi, power, cadence, speed, heartRate,
+                                      msg)
+            self._devices[key] = snapshot
+            self._order[key] = snapshot
+            self._order.move_to_end(key)
+            self._version = version
+        return snapshot
+
+    def get(self, deviceNumber: int, deviceType: int) -> DeviceSnapshot:
+        """
+        :return: Snapshot of the device, or None if it has not been seen
+        """
+        return self._devices.get((deviceNumber, deviceType))
+
+    def snapshot(self):
+        """
+        :return: Read-only mapping of (deviceNumber, deviceType) to DeviceSnapshot, as of now. It is a copy, so it
+                 does not change with later updates.
+        """
+        return MappingProxyType(self._devices.copy())
+
+    def changedSince(self, version: int):
+        """
+        :param version: Version returned by a previous call, or 0 for every device
+        :return: (current version, list of snapshots updated after version, oldest first)
+        """
+        changed = []
+        with self._lock:
+            current = self._version
+            for snapshot in reversed(self._order.values()):
+                if snapshot.version <= version:
+                    break
+                changed.append(snapshot)
+        changed.reverse()
+        return current if current else version, changed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._devices = {}
+            self._order = OrderedDict()
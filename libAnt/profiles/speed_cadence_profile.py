@@ -5,23 +5,30 @@ from libAnt.profiles.profile import ProfileMessage
 class SpeedAndCadenceProfileMessage(ProfileMessage):
     """ Message from Speed & Cadence sensor """
 
-    def __init__(self, msg, previous):
-        super().__init__(msg, previous)
+    deviceTypes = (121,)
+
+    def __init__(self, msg, previous, timestamp: float = None):
+        super().__init__(msg, previous, timestamp)
         self.staleSpeedCounter = previous.staleSpeedCounter if previous is not None else 0
         self.staleCadenceCounter = previous.staleCadenceCounter if previous is not None else 0
         self.totalRevolutions = previous.totalRevolutions + self.cadenceRevCountDiff if previous is not None else 0
         self.totalSpeedRevolutions = previous.totalSpeedRevolutions + self.speedRevCountDiff if previous is not None else 0
+        # (revolutions, event time) diffs of the last message with a new event, reused while the sensor repeats itself
+        self.lastSpeedDiffs = previous.lastSpeedDiffs if previous is not None else None
+        self.lastCadenceDiffs = previous.lastCadenceDiffs if previous is not None else None
 
         if self.previous is not None:
             if self.speedEventTime == self.previous.speedEventTime:
                 self.staleSpeedCounter += 1
             else:
                 self.staleSpeedCounter = 0
+                self.lastSpeedDiffs = (self.speedRevCountDiff, self.speedEventTimeDiff)
 
             if self.cadenceEventTime == self.previous.cadenceEventTime:
                 self.staleCadenceCounter += 1
             else:
                 self.staleCadenceCounter = 0
+                self.lastCadenceDiffs = (self.cadenceRevCountDiff, self.cadenceEventTimeDiff)
 
     maxCadenceEventTime = 65536
     maxSpeedEventTime = 65536
@@ -29,6 +36,7 @@ class SpeedAndCadenceProfileMessage(ProfileMessage):
     maxCadenceRevCount = 65536
     maxstaleSpeedCounter = 7
     maxstaleCadenceCounter = 7
+    historyProperties = ('speedEventTimeDiff', 'cadenceEventTimeDiff', 'speedRevCountDiff', 'cadenceRevCountDiff')
 
     def __str__(self):
         ret = '{} Speed: {:.2f}m/s (avg: {:.2f}m/s)\n'.format(super().__str__(), self.speed(2096),
@@ -105,13 +113,10 @@ class SpeedAndCadenceProfileMessage(ProfileMessage):
         :param c: circumference of the wheel (mm)
         :return: The current speed (m/sec)
         """
-        if self.previous is None:
+        if self.lastSpeedDiffs is None or self.staleSpeedCounter > self.maxstaleSpeedCounter:
             return 0
-        if self.speedEventTime == self.previous.speedEventTime:
-            if self.staleSpeedCounter > self.maxstaleSpeedCounter:
-                return 0
-            return self.previous.speed(c)
-        return self.speedRevCountDiff * 1.024 * c / self.speedEventTimeDiff
+        revCountDiff, eventTimeDiff = self.lastSpeedDiffs
+        return revCountDiff * 1.024 * c / eventTimeDiff
 
     def distance(self, c):
         """
@@ -132,13 +137,10 @@ class SpeedAndCadenceProfileMessage(ProfileMessage):
         """
         :return: RPM
         """
-        if self.previous is None:
+        if self.lastCadenceDiffs is None or self.staleCadenceCounter > self.maxstaleCadenceCounter:
             return 0
-        if self.cadenceEventTime == self.previous.cadenceEventTime:
-            if self.staleCadenceCounter > self.maxstaleCadenceCounter:
-                return 0
-            return self.previous.cadence
-        return self.cadenceRevCountDiff * 1024 * 60 / self.cadenceEventTimeDiff
+        revCountDiff, eventTimeDiff = self.lastCadenceDiffs
+        return revCountDiff * 1024 * 60 / eventTimeDiff
 
     @lazyproperty
     def averageCadence(self):
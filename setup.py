@@ -13,4 +13,5 @@ setup(
     download_url='https://github.com/half2me/libAnt/tarball/0.1.3',
     keywords = ['ant', 'antplus', 'ant+', 'antfs', 'thisisant'],
     install_requires=['pyusb>=1.0.0', 'pyserial>=3.1.1'],
+    extras_require={'numpy': ['numpy']},
 )
@@ -0,0 +1,52 @@
+import math
+import os
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from libAnt.arrays import readBroadcastArray, powerArray, speedCadenceArray
+from libAnt.capture import readBroadcasts, readProfileMessages
+from libAnt.profiles.power_profile import PowerProfileMessage
+from libAnt.profiles.speed_cadence_profile import SpeedAndCadenceProfileMessage
+
+demoCapture = os.path.join(os.path.dirname(__file__), '..', 'demos', 'demo-capture-1.pcap')
+
+
+def profileValues(cls, fields) -> list:
+    return [tuple(getattr(pmsg.msg if f == 'deviceNumber' else pmsg, f) for f in fields)
+            for pmsg in readProfileMessages(demoCapture) if isinstance(pmsg, cls)]
+
+
+def arrayValues(array, fields) -> list:
+    return [tuple(None if isinstance(v, float) and math.isnan(v) else v.item() for v in row)
+            for row in array[list(fields)]]
+
+
+def test_broadcasts_match_the_messages():
+    broadcasts = readBroadcastArray(demoCapture)
+    messages = list(readBroadcasts(demoCapture, withTimestamp=True))
+    assert len(broadcasts) == len(messages)
+    for row, (ts, bmsg) in zip(broadcasts, messages):
+        assert row['timestamp'] == ts
+        assert bytes(row['content']) == bytes(bmsg.content)
+        assert row['deviceNumber'] == (bmsg.deviceNumber or 0)
+        assert row['deviceType'] == (bmsg.deviceType or 0)
+        assert row['rssi'] == (bmsg.rssi or 0)
+
+
+def test_power_matches_the_profile_messages():
+    fields = ('deviceNumber', 'eventCount', 'instantaneousCadence', 'accumulatedPower', 'instantaneousPower',
+              'averagePower')
+    expected = profileValues(PowerProfileMessage, fields)
+    decoded = arrayValues(powerArray(readBroadcastArray(demoCapture)), fields)
+    assert decoded and decoded == expected
+
+
+def test_speed_cadence_matches_the_profile_messages():
+    fields = ('cadenceEventTime', 'cumulativeCadenceRevolutionCount', 'speedEventTime',
+              'cumulativeSpeedRevolutionCount', 'cadenceEventTimeDiff', 'cadenceRevCountDiff', 'speedEventTimeDiff',
+              'speedRevCountDiff')
+    expected = profileValues(SpeedAndCadenceProfileMessage, fields)
+    decoded = arrayValues(speedCadenceArray(readBroadcastArray(demoCapture)), fields)
+    assert decoded and decoded == expected
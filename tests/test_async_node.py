@@ -0,0 +1,72 @@
+import asyncio
+import os
+
+import pytest
+
+from libAnt.async_node import AsyncNode
+from libAnt.drivers.pcap import PcapDriver
+
+demoCapture = os.path.join(os.path.dirname(__file__), '..', 'demos', 'demo-capture-1.pcap')
+
+
+class FailingDriver(PcapDriver):
+    """ Replays the demo capture, then fails like a device which was unplugged """
+
+    def __init__(self):
+        super().__init__(demoCapture, speed=None)
+        self.reads = 0
+
+    def readAll(self, timeout=None):
+        self.reads += 1
+        if self.reads > 1:
+            raise OSError('Device is gone')
+        messages = super().readAll(timeout)
+        self._wakeup.set()  # Readable again, so the next read fails
+        return messages
+
+
+def run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, 5))
+
+
+def test_broadcasts_are_received():
+    async def receive():
+        async with AsyncNode(PcapDriver(demoCapture, speed=None)) as n:
+            await n.start()
+            messages = []
+            async for msg in n:
+                messages.append(msg)
+                if len(messages) == 10:
+                    break
+            return messages
+
+    messages = run(receive())
+    assert len(messages) == 10
+    assert all(m.deviceNumber is not None for m in messages)
+
+
+def test_iteration_ends_after_an_error():
+    async def receive():
+        n = AsyncNode(FailingDriver())
+        await n.start()
+        received = 0
+        with pytest.raises(OSError):
+            async for msg in n:
+                received += 1
+        async for msg in n:  # A consumer which keeps iterating is not left waiting forever
+            received += 1
+        await n.stop()
+        return received
+
+    assert run(receive()) > 0
+
+
+def test_drivers_release_their_wakeup_pipe_on_close():
+    driver = PcapDriver(demoCapture, speed=None)
+    for i in range(2):
+        with driver:
+            fd = driver.fileno()
+            assert fd is not None
+        assert driver.fileno() is None
+        with pytest.raises(OSError):
+            os.fstat(fd)
@@ -0,0 +1,46 @@
+import os
+import shutil
+
+import pytest
+
+from libAnt.capture import CaptureIndex
+
+demoCapture = os.path.join(os.path.dirname(__file__), '..', 'demos', 'demo-capture-1.pcap')
+
+
+@pytest.fixture
+def capture(tmp_path):
+    path = str(tmp_path / 'capture.pcap')
+    shutil.copy(demoCapture, path)
+    return path
+
+
+def test_index_is_saved_and_loaded(capture):
+    built = CaptureIndex.open(capture)
+    assert os.path.exists(capture + '.idx')
+    loaded = CaptureIndex.load(capture)
+    assert loaded.buckets == built.buckets
+    assert set(loaded.devices) == set(built.devices)
+
+
+@pytest.mark.parametrize('length', [0, 30, -5, -16])
+def test_truncated_index_is_rebuilt(capture, length):
+    built = CaptureIndex.open(capture)
+    with open(capture + '.idx', 'rb') as f:
+        data = f.read()
+    with open(capture + '.idx', 'wb') as f:
+        f.write(data[:length])
+    rebuilt = CaptureIndex.open(capture)
+    assert set(rebuilt.devices) == set(built.devices)
+    with open(capture + '.idx', 'rb') as f:
+        assert f.read() == data
+
+
+def test_read_matches_a_full_scan(capture):
+    index = CaptureIndex.open(capture)
+    deviceNumber, deviceType = next(iter(index.devices))
+    everything = list(index.read())
+    start, end = everything[0][0], everything[len(everything) // 2][0]
+    expected = [(ts, m.raw) for ts, m in everything if start <= ts < end and m.deviceNumber == deviceNumber]
+    found = [(ts, m.raw) for ts, m in index.read(start, end, deviceNumber=deviceNumber)]
+    assert found and found == expected
@@ -0,0 +1,62 @@
+import os
+from queue import Empty
+
+from libAnt.capture import readBroadcasts, readMessages, readProfileMessages
+from libAnt.constants import MESSAGE_CHANNEL_BROADCAST_DATA
+from libAnt.drivers.pcap import PcapDriver
+from libAnt.message import BroadcastMessage
+from libAnt.profiles.factory import Factory
+from libAnt.profiles.power_profile import PowerProfileMessage
+from libAnt.profiles.speed_cadence_profile import SpeedAndCadenceProfileMessage
+
+demoCapture = os.path.join(os.path.dirname(__file__), '..', 'demos', 'demo-capture-1.pcap')
+
+powerFields = ('eventCount', 'instantaneousCadence', 'accumulatedPower', 'instantaneousPower',
+               'accumulatedPowerDiff', 'eventCountDiff', 'averagePower')
+speedCadenceFields = ('cadenceEventTime', 'cumulativeCadenceRevolutionCount', 'speedEventTime',
+                      'cumulativeSpeedRevolutionCount', 'cadenceEventTimeDiff', 'cadenceRevCountDiff',
+                      'speedEventTimeDiff', 'speedRevCountDiff')
+
+
+def values(pmsg) -> tuple:
+    fields = powerFields if isinstance(pmsg, PowerProfileMessage) else \
+        speedCadenceFields if isinstance(pmsg, SpeedAndCadenceProfileMessage) else ()
+    return (type(pmsg), pmsg.msg.deviceNumber, bytes(pmsg.msg.content)) + tuple(getattr(pmsg, f) for f in fields)
+
+
+def replayedProfileMessages() -> list:
+    """ Values of the profile messages decoded one by one from a replay of the demo capture """
+    factory = Factory()
+    decoded = []
+    with PcapDriver(demoCapture, speed=None) as driver:
+        while True:
+            try:
+                msg = driver.read(timeout=0.5)
+            except Empty:
+                return decoded
+            if msg.type == MESSAGE_CHANNEL_BROADCAST_DATA:
+                pmsg = factory.parseMessage(BroadcastMessage(msg.type, msg.content).build(msg.content))
+                if pmsg is not None:
+                    decoded.append(values(pmsg))
+
+
+def test_messages_match_a_replay():
+    replayed = []
+    with PcapDriver(demoCapture, speed=None) as driver:
+        while True:
+            try:
+                msg = driver.read(timeout=0.5)
+            except Empty:
+                break
+            replayed.append((msg.type, bytes(msg.content)))
+    assert [(m.type, bytes(m.content)) for m in readMessages(demoCapture)] == replayed
+
+
+def test_broadcasts_are_timestamped_in_order():
+    timestamps = [ts for ts, bmsg in readBroadcasts(demoCapture, withTimestamp=True)]
+    assert timestamps and timestamps == sorted(timestamps)
+
+
+def test_profile_messages_match_a_replay():
+    decoded = [values(pmsg) for pmsg in readProfileMessages(demoCapture)]
+    assert decoded and decoded == replayedProfileMessages()
@@ -0,0 +1,27 @@
+import pytest
+
+from libAnt.channels import ChannelManager, ChannelException
+from libAnt.constants import *
+from libAnt.node import Node
+
+
+def test_extended_messages_are_configured():
+    node = Node(None)
+    ChannelManager(node, rxTimestamp=False)
+    types = [m.type for m in node._init]
+    assert MESSAGE_ENABLE_EXT_RX_MESSAGES in types
+    libConfig = next(m for m in node._init if m.type == MESSAGE_LIB_CONFIG)
+    assert libConfig.content[1] == EXT_FLAG_CHANNEL_ID | EXT_FLAG_RSSI
+
+
+def test_channels_are_allocated_and_freed():
+    node = Node(None)
+    channels = ChannelManager(node, maxChannels=2)
+    first = channels.open(1, 11, None)
+    second = channels.open(2, 120, None)
+    with pytest.raises(ChannelException):
+        channels.open(3, 121, None)
+    channels.close(first)
+    assert channels.open(3, 121, None).number == first.number
+    assert len(channels) == 2
+    assert second.period == ANTPLUS_PROFILE_PERIODS[120]
@@ -0,0 +1,121 @@
+import threading
+from queue import Empty, Full
+
+import pytest
+
+from libAnt.core import BatchCallback, BoundedQueue, QueuedCallback, BLOCK, DROP_OLDEST, KEEP_LATEST, lazyproperty
+
+
+class Counted:
+    def __init__(self):
+        self.calls = 0
+
+    @lazyproperty
+    def value(self):
+        self.calls += 1
+        return 42
+
+
+class Slotted:
+    __slots__ = ('calls',)
+
+    def __init__(self):
+        self.calls = 0
+
+    @lazyproperty
+    def value(self):
+        self.calls += 1
+        return 42
+
+
+class SlottedWithCache(Slotted):
+    __slots__ = ('_lazy_value',)
+
+
+@pytest.mark.parametrize('cls, calls', [(Counted, 1), (Slotted, 2), (SlottedWithCache, 1)])
+def test_lazy_property(cls, calls):
+    obj = cls()
+    assert obj.value == 42
+    assert obj.value == 42
+    assert obj.calls == calls
+
+
+def test_batches_are_delivered_in_order():
+    batches = []
+    callback = BatchCallback(batches.append, maxSize=3, maxDelay=10)
+    for i in range(7):
+        callback(i)
+    callback.close()
+    assert [m for batch in batches for m in batch] == list(range(7))
+    assert all(len(batch) <= 3 for batch in batches)
+
+
+def test_batch_delivery_goes_on_after_the_callback_raises():
+    delivered = []
+    errors = []
+    failed = threading.Event()
+
+    def deliver(batch):
+        if not failed.is_set():
+            failed.set()
+            raise ValueError('once')
+        delivered.extend(batch)
+
+    callback = BatchCallback(deliver, maxSize=10, maxDelay=0.01, onError=errors.append)
+    callback('lost')
+    assert failed.wait(1)
+    for i in range(50):
+        callback(i)
+    callback.close()
+    assert delivered == list(range(50))
+    assert [str(e) for e in errors] == ['once']
+
+
+def test_bounded_queue_blocks_when_full():
+    queue = BoundedQueue(2, BLOCK)
+    queue.put(1)
+    queue.put(2)
+    with pytest.raises(Full):
+        queue.put(3, timeout=0.01)
+    assert [queue.get(), queue.get()] == [1, 2]
+    assert queue.dropped == 0
+
+
+def test_bounded_queue_drops_oldest():
+    queue = BoundedQueue(2, DROP_OLDEST)
+    for i in range(5):
+        queue.put(i)
+    assert [queue.get(), queue.get()] == [3, 4]
+    assert queue.dropped == 3
+
+
+def test_bounded_queue_keeps_latest_per_key():
+    queue = BoundedQueue(2, KEEP_LATEST, key=lambda item: item[0])
+    for item in [('a', 1), ('b', 1), ('a', 2)]:
+        queue.put(item)
+    assert [queue.get(), queue.get()] == [('a', 2), ('b', 1)]
+    assert queue.dropped == 1
+
+
+def test_closed_bounded_queue_stops_waiting_consumers():
+    queue = BoundedQueue()
+    queue.close()
+    with pytest.raises(Empty):
+        queue.get(timeout=1)
+
+
+def test_queued_delivery_goes_on_after_the_callback_raises():
+    delivered = []
+    errors = []
+
+    def deliver(msg):
+        if msg == 0:
+            raise ValueError('once')
+        delivered.append(msg)
+
+    callback = QueuedCallback(deliver, 4, BLOCK, onError=errors.append)
+    for i in range(50):
+        callback(i)
+    callback.close()
+    assert delivered == list(range(1, 50))
+    assert [str(e) for e in errors] == ['once']
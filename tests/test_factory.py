@@ -0,0 +1,28 @@
+from libAnt.profiles.factory import Factory
+from libAnt.profiles.power_profile import PowerProfileMessage
+from libAnt.profiles.profile import ProfileMessage
+
+
+class AnyPowerPage(ProfileMessage):
+    deviceTypes = (11,)
+
+
+def test_page_specific_profiles_take_precedence():
+    Factory.register(AnyPowerPage)
+    try:
+        assert Factory._dispatch[(11, 0x10)] is PowerProfileMessage
+        assert Factory._dispatch[(11, 0x11)] is AnyPowerPage
+    finally:
+        Factory.unregister(AnyPowerPage)
+    assert (11, 0x11) not in Factory._dispatch
+
+
+def test_unregister_restores_shadowed_profiles():
+    Factory.register(AnyPowerPage)
+    Factory.unregister(PowerProfileMessage)
+    try:
+        assert Factory._dispatch[(11, 0x10)] is AnyPowerPage
+    finally:
+        Factory.register(PowerProfileMessage)
+        Factory.unregister(AnyPowerPage)
+    assert Factory._dispatch[(11, 0x10)] is PowerProfileMessage
@@ -0,0 +1,96 @@
+from libAnt.constants import MESSAGE_CHANNEL_BROADCAST_DATA, MESSAGE_CHANNEL_EVENT, MESSAGE_MAX_LENGTH
+from libAnt.drivers.driver import FrameDecoder
+from libAnt.message import Message
+
+broadcast = Message(MESSAGE_CHANNEL_BROADCAST_DATA, bytes([0, 0x10, 1, 0xFF, 90, 0x20, 0x03, 0x96, 0x00]))
+event = Message(MESSAGE_CHANNEL_EVENT, bytes([0, 1, 3]))
+
+
+def decoded(messages) -> list:
+    return [(m.type, bytes(m.content)) for m in messages]
+
+
+def expected(*messages) -> list:
+    return [(m.type, bytes(m.content)) for m in messages]
+
+
+def test_whole_frames():
+    decoder = FrameDecoder()
+    assert decoded(decoder.decode(broadcast.encode() + event.encode())) == expected(broadcast, event)
+    assert len(decoder) == 0
+
+
+def test_frame_split_across_chunks():
+    decoder = FrameDecoder()
+    data = broadcast.encode() + event.encode()
+    messages = []
+    for i in range(len(data)):
+        messages += decoder.decode(data[i:i + 1])
+    assert decoded(messages) == expected(broadcast, event)
+    assert len(decoder) == 0
+
+
+def test_incomplete_frame_is_kept():
+    decoder = FrameDecoder()
+    data = broadcast.encode()
+    assert decoder.decode(data[:5]) == []
+    assert len(decoder) == 5
+    assert decoded(decoder.decode(data[5:])) == expected(broadcast)
+
+
+def test_leading_garbage():
+    decoder = FrameDecoder()
+    assert decoded(decoder.decode(b'\x00\x13\x37' + broadcast.encode())) == expected(broadcast)
+    assert decoder.resyncs == 1
+    assert decoder.checksumErrors == 0
+
+
+def test_garbage_without_sync_byte_is_discarded():
+    decoder = FrameDecoder()
+    assert decoder.decode(b'\x00\x01\x02\x03') == []
+    assert len(decoder) == 0
+
+
+def test_bad_checksum_with_sync_byte_in_payload():
+    frame = bytearray(Message(MESSAGE_CHANNEL_BROADCAST_DATA, bytes([0, 0xA4, 1, 0x4E, 0, 0, 0, 0, 0])).encode())
+    frame[-1] ^= 0xFF
+    decoder = FrameDecoder()
+    assert decoded(decoder.decode(bytes(frame) + event.encode())) == expected(event)
+    assert decoder.checksumErrors >= 1
+
+
+def test_bad_checksum_split_across_chunks():
+    frame = bytearray(broadcast.encode())
+    frame[-1] ^= 0xFF
+    data = bytes(frame) + broadcast.encode()
+    decoder = FrameDecoder()
+    messages = decoder.decode(data[:len(frame) - 1]) + decoder.decode(data[len(frame) - 1:])
+    assert decoded(messages) == expected(broadcast)
+
+
+def test_length_above_maximum():
+    decoder = FrameDecoder()
+    data = bytes([0xA4, MESSAGE_MAX_LENGTH + 1, MESSAGE_CHANNEL_BROADCAST_DATA]) + event.encode()
+    assert decoded(decoder.decode(data)) == expected(event)
+    assert decoder.checksumErrors == 0
+
+
+def test_length_above_maximum_does_not_wait_for_more_data():
+    decoder = FrameDecoder()
+    assert decoder.decode(bytes([0xA4, 0xFF, 0x4E, 0x00])) == []
+    assert decoded(decoder.decode(event.encode())) == expected(event)
+
+
+def test_frames_are_passed_to_onFrame():
+    frames = []
+    decoder = FrameDecoder(onFrame=frames.append)
+    decoder.decode(b'\x00' + broadcast.encode() + event.encode())
+    assert frames == [broadcast.encode(), event.encode()]
+
+
+def test_reset():
+    decoder = FrameDecoder()
+    decoder.decode(broadcast.encode()[:4])
+    decoder.reset()
+    assert len(decoder) == 0
+    assert decoded(decoder.decode(event.encode())) == expected(event)
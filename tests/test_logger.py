@@ -0,0 +1,41 @@
+import pytest
+
+from libAnt.loggers.logger import Logger
+
+
+class FullDisk:
+    """ Log file whose writes fail like on a full disk """
+
+    def __init__(self, file):
+        self._file = file
+
+    def write(self, data):
+        raise OSError(28, 'No space left on device')
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self._file.close()
+
+
+def test_logged_data_is_written(tmp_path):
+    logger = Logger(str(tmp_path / 'log.bin'), bufferSize=16)
+    with logger:
+        for i in range(10):
+            logger.log(bytes([i] * 5))
+        path = logger._logFile
+    with open(path, 'rb') as f:
+        assert f.read() == b''.join(bytes([i] * 5) for i in range(10))
+
+
+def test_write_errors_are_raised_instead_of_hanging(tmp_path):
+    logger = Logger(str(tmp_path / 'log.bin'), bufferSize=16)
+    logger.open()
+    logger._log = FullDisk(logger._log)
+    with pytest.raises(OSError):
+        for i in range(100):
+            logger.log(bytes(8))
+    with pytest.raises(OSError):
+        logger.close()
+    assert logger._log is None
@@ -0,0 +1,68 @@
+import pytest
+
+from libAnt.constants import *
+from libAnt.message import *
+
+content = bytes([0x10, 1, 0xFF, 90, 0x20, 0x03, 0x96, 0x00])
+channelId = bytes([0x6C, 0x4A, 11, 5])  # Device 19052, power meter
+rssi = bytes([0x20, 0xC4, 0x80])  # -60 dBm
+rxTimestamp = bytes([0x34, 0x12])
+
+
+def broadcast(flag: int = None, *fields) -> BroadcastMessage:
+    raw = bytes([0]) + content
+    if flag is not None:
+        raw += bytes([flag]) + b''.join(fields)
+    return BroadcastMessage(MESSAGE_CHANNEL_BROADCAST_DATA, raw).build(raw)
+
+
+def test_without_extended_data():
+    msg = broadcast()
+    assert msg.content == content
+    assert msg.flag is None
+    assert (msg.deviceNumber, msg.deviceType, msg.rssi, msg.rxTimestamp) == (None, None, None, None)
+
+
+def test_every_extended_field():
+    msg = broadcast(EXT_FLAG_CHANNEL_ID | EXT_FLAG_RSSI | EXT_FLAG_TIMESTAMP, channelId, rssi, rxTimestamp)
+    assert (msg.deviceNumber, msg.deviceType, msg.transType) == (19052, 11, 5)
+    assert (msg.rssiMeasurementType, msg.rssi, msg.rssiThreshold) == (0x20, 0xC4, 0x80)
+    assert msg.rxTimestamp == 0x1234
+
+
+@pytest.mark.parametrize('flag, fields', [
+    (EXT_FLAG_CHANNEL_ID, (channelId,)),
+    (EXT_FLAG_RSSI, (rssi,)),
+    (EXT_FLAG_TIMESTAMP, (rxTimestamp,)),
+    (EXT_FLAG_RSSI | EXT_FLAG_TIMESTAMP, (rssi, rxTimestamp)),
+    (EXT_FLAG_CHANNEL_ID | EXT_FLAG_TIMESTAMP, (channelId, rxTimestamp)),
+])
+def test_fields_are_found_after_the_flagged_ones(flag, fields):
+    msg = broadcast(flag, *fields)
+    assert msg.deviceNumber == (19052 if flag & EXT_FLAG_CHANNEL_ID else None)
+    assert msg.rssi == (0xC4 if flag & EXT_FLAG_RSSI else None)
+    assert msg.rxTimestamp == (0x1234 if flag & EXT_FLAG_TIMESTAMP else None)
+
+
+@pytest.mark.parametrize('raw', [
+    bytes([0]) + content[:7],
+    bytes([0]) + content + bytes([EXT_FLAG_CHANNEL_ID]) + channelId[:3],
+    bytes([0]) + content + bytes([EXT_FLAG_CHANNEL_ID | EXT_FLAG_RSSI]) + channelId + rssi[:2],
+])
+def test_truncated_messages_are_rejected(raw):
+    with pytest.raises(ValueError):
+        BroadcastMessage(MESSAGE_CHANNEL_BROADCAST_DATA, raw).build(raw)
+
+
+def test_messages_have_no_dict():
+    for msg in (SystemResetMessage(), OpenChannelMessage(0), broadcast()):
+        assert not hasattr(msg, '__dict__')
+
+
+def test_encode():
+    encoded = OpenChannelMessage(3).encode()
+    assert encoded[:4] == bytes([MESSAGE_TX_SYNC, 1, MESSAGE_CHANNEL_OPEN, 3])
+    checksum = 0
+    for b in encoded:
+        checksum ^= b
+    assert checksum == 0
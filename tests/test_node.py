@@ -0,0 +1,17 @@
+from libAnt.constants import *
+from libAnt.message import SystemResetMessage, OpenChannelMessage
+from libAnt.node import Command, rxScanModeMessages, responseKey
+
+
+def test_resets_are_never_resent():
+    assert Command(SystemResetMessage(), retries=2).retries == 0
+    assert Command(OpenChannelMessage(0), retries=2).retries == 2
+
+
+def test_scan_mode_configuration_has_no_reset():
+    assert MESSAGE_SYSTEM_RESET not in [m.type for m in rxScanModeMessages()]
+
+
+def test_response_keys():
+    assert responseKey(SystemResetMessage()) == (None, MESSAGE_STARTUP)
+    assert responseKey(OpenChannelMessage(3)) == (3, MESSAGE_CHANNEL_OPEN)
@@ -0,0 +1,51 @@
+import pytest
+
+from libAnt.constants import MESSAGE_CHANNEL_EVENT
+from libAnt.drivers.driver import DriverException
+from libAnt.drivers.pcap import PcapReader, PcapDriver
+from libAnt.loggers.pcap import PcapLogger
+from libAnt.message import Message
+
+event = Message(MESSAGE_CHANNEL_EVENT, bytes([0, 1, 3]))
+
+
+def capture(tmp_path, frames) -> str:
+    logger = PcapLogger(str(tmp_path / 'capture.pcap'))
+    with logger:
+        for frame in frames:
+            logger.log(frame)
+        path = logger._logFile
+    return path
+
+
+def test_reader_returns_every_packet(tmp_path):
+    path = capture(tmp_path, [event.encode()] * 3)
+    with PcapReader(path) as reader:
+        assert [data for ts, data in reader] == [event.encode()] * 3
+        assert [data for offset, ts, data in reader.packets()] == [event.encode()] * 3
+
+
+def test_truncated_record_is_not_returned(tmp_path):
+    path = capture(tmp_path, [event.encode()] * 3)
+    with open(path, 'rb') as f:
+        data = f.read()
+    with PcapReader(data[:-2]) as reader:
+        assert [data for ts, data in reader] == [event.encode()] * 2
+        assert [data for offset, ts, data in reader.packets()] == [event.encode()] * 2
+
+
+def test_replay(tmp_path):
+    path = capture(tmp_path, [event.encode()] * 3)
+    with PcapDriver(path, speed=None) as driver:
+        messages = [driver.read(timeout=1) for i in range(3)]
+    assert [(m.type, bytes(m.content)) for m in messages] == [(event.type, event.content)] * 3
+
+
+def test_replay_errors_are_raised_by_the_reader(tmp_path):
+    path = tmp_path / 'not-a-capture.pcap'
+    path.write_bytes(b'not a pcap file at all')
+    with PcapDriver(str(path), speed=None) as driver:
+        with pytest.raises(DriverException):
+            driver.read(timeout=1)
+        with pytest.raises(DriverException):
+            driver.read(timeout=1)
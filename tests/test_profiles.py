@@ -0,0 +1,23 @@
+import os
+
+from libAnt.capture import readProfileMessages
+
+demoCapture = os.path.join(os.path.dirname(__file__), '..', 'demos', 'demo-capture-1.pcap')
+
+
+def test_only_one_step_of_history_is_kept():
+    messages = list(readProfileMessages(demoCapture))
+    assert messages
+    for pmsg in messages:
+        assert pmsg.previous is None or pmsg.previous.previous is None
+
+
+def test_history_values_survive_detaching():
+    immediate = []
+    messages = []
+    for pmsg in readProfileMessages(demoCapture):
+        immediate.append(tuple(getattr(pmsg, name) for name in pmsg.historyProperties))
+        messages.append(pmsg)
+    assert [tuple(getattr(pmsg, name) for name in pmsg.historyProperties) for pmsg in messages] == immediate
+    latest = {(pmsg.msg.deviceNumber, type(pmsg)): pmsg for pmsg in messages}
+    assert all(pmsg.previous is None for pmsg in messages if pmsg not in latest.values())
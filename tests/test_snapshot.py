@@ -0,0 +1,49 @@
+from libAnt.constants import EXT_FLAG_CHANNEL_ID, MESSAGE_CHANNEL_BROADCAST_DATA
+from libAnt.message import BroadcastMessage
+from libAnt.profiles.factory import Factory
+from libAnt.profiles.snapshot import SnapshotStore
+
+
+def powerPage(deviceNumber: int, event: int, power: int) -> BroadcastMessage:
+    accumulated = event * power & 0xFFFF
+    raw = bytes([0, 0x10, event & 0xFF, 0xFF, 90, accumulated & 0xFF, accumulated >> 8, power & 0xFF, power >> 8,
+                 EXT_FLAG_CHANNEL_ID, deviceNumber & 0xFF, deviceNumber >> 8, 11, 1])
+    return BroadcastMessage(MESSAGE_CHANNEL_BROADCAST_DATA, raw).build(raw)
+
+
+def test_factory_updates_the_store():
+    store = SnapshotStore()
+    factory = Factory(snapshots=store)
+    for event in range(1, 4):
+        factory.parseMessage(powerPage(1, event, 200), timestamp=event)
+    snapshot = store.get(1, 11)
+    assert snapshot.power == 200
+    assert snapshot.lastSeen == 3
+    assert snapshot.version == store.version == 3
+    assert store.get(2, 11) is None
+
+
+def test_changed_since_returns_devices_updated_after_the_version():
+    store = SnapshotStore()
+    factory = Factory(snapshots=store)
+    for deviceNumber in (1, 2, 3):
+        factory.parseMessage(powerPage(deviceNumber, 1, 100), timestamp=0)
+    version, changed = store.changedSince(0)
+    assert version == 3
+    assert [s.deviceNumber for s in changed] == [1, 2, 3]
+
+    factory.parseMessage(powerPage(1, 2, 100), timestamp=1)
+    version, changed = store.changedSince(version)
+    assert version == 4
+    assert [s.deviceNumber for s in changed] == [1]
+    assert store.changedSince(version) == (4, [])
+
+
+def test_snapshot_does_not_change_with_later_updates():
+    store = SnapshotStore()
+    factory = Factory(snapshots=store)
+    factory.parseMessage(powerPage(1, 1, 100), timestamp=0)
+    snapshot = store.snapshot()
+    factory.parseMessage(powerPage(2, 1, 100), timestamp=0)
+    assert list(snapshot) == [(1, 11)]
+    assert len(store) == 2
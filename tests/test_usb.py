@@ -0,0 +1,55 @@
+import time
+from array import array
+
+from libAnt.constants import MESSAGE_CHANNEL_EVENT
+from libAnt.core import BoundedQueue
+from libAnt.drivers.driver import Wakeup
+from libAnt.drivers.usb import USBDriver
+from libAnt.message import Message
+
+event = Message(MESSAGE_CHANNEL_EVENT, bytes([0, 1, 3]))
+
+
+class Endpoint:
+    """ USB endpoint which returns the given packets, then times out """
+
+    def __init__(self, packets):
+        self._packets = list(packets)
+
+    def read(self, size, timeout=None):
+        if self._packets:
+            return array('B', self._packets.pop(0))
+        time.sleep(0.001)
+        return array('B')
+
+
+def openDriver(packets, bufferSize: int = 0, bufferPolicy: str = 'block') -> USBDriver:
+    """ A USBDriver reading from a fake endpoint instead of a device """
+    driver = USBDriver(0, 0, bufferSize=bufferSize, bufferPolicy=bufferPolicy)
+    driver._queue = BoundedQueue(bufferSize, bufferPolicy)
+    driver._wakeup = Wakeup()
+    driver._loop = driver.USBLoop(Endpoint(packets), driver._packetSize, driver._queue, driver._wakeup)
+    driver._loop.start()
+    driver._driver_open = True
+    return driver
+
+
+def test_packets_are_queued_whole():
+    data = event.encode() * 3
+    driver = openDriver([data[:5], data[5:]])
+    try:
+        messages = []
+        while len(messages) < 3:
+            messages += driver.readAll(timeout=1)
+        assert [(m.type, bytes(m.content)) for m in messages] == [(event.type, event.content)] * 3
+    finally:
+        driver.close()
+
+
+def test_read_slices_packets():
+    driver = openDriver([event.encode() * 2])
+    try:
+        assert driver._read(3, timeout=1) == event.encode()[:3]
+        assert driver._read(len(event.encode()), timeout=1) == (event.encode() * 2)[3:3 + len(event.encode())]
+    finally:
+        driver.close()